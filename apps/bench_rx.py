@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#stress benchmark for the receive path.
+#synthesizes a baseband capture full of DF17 squitters at a given
+#aircraft density, runs it through rx_path as fast as the flowgraph
+#will go, and reports how many frames came out and how quickly.
+#with --preamble-only, feeds precomputed magnitude and noise average
+#straight into the preamble block and reports its cost in ns/sample.
+#with --latency, plays the capture in real time through each way of
+#publishing frames -- the old msg_queue route with its text round trip,
+#pdu_iface_sink as modes_radio uses by default, and pdu_publisher as with
+#--direct -- and reports how long frames take
+#to reach a ZMQ subscriber, counted from the time of the frame's first
+#sample. that includes the frame's own 64 or 120us on the air.
+
+from gnuradio import gr, gru, blocks
+from gnuradio.eng_option import eng_option
+from optparse import OptionParser
+import numpy
+import pmt
+import threading
+import time
+import zmq
+import air_modes
+
+POLY = 0xFFF409
+
+def modes_crc(data):
+  crc = 0
+  for byte in data:
+    crc ^= byte << 16
+    for k in range(8):
+      crc <<= 1
+      if crc & 0x1000000:
+        crc ^= POLY
+  return crc & 0xFFFFFF
+
+#a random DF17 squitter with valid parity
+def make_squitter(rng, icao):
+  data = bytearray(14)
+  data[0] = (17 << 3) | 5
+  data[1:4] = icao.to_bytes(3, 'big')
+  data[4:11] = rng.integers(0, 256, 7, dtype=numpy.uint8).tobytes()
+  data[11:14] = modes_crc(data[:11]).to_bytes(3, 'big')
+  return data
+
+#chip sequence (2Mchips/s) for a whole frame: 16 preamble chips then PPM data
+def frame_chips(data):
+  chips = [1,0,1,0,0,0,0,1,0,1,0,0,0,0,0,0]
+  for byte in data:
+    for k in range(8):
+      bit = (byte >> (7-k)) & 1
+      chips += [bit, 1-bit]
+  return numpy.array(chips, dtype=numpy.float32)
+
+def synthesize(rate, seconds, naircraft, replies_per_ac, snr_db, seed=0):
+  rng = numpy.random.default_rng(seed)
+  nsamples = int(rate * seconds)
+  spc = rate / 2e6
+  noise = (rng.standard_normal(nsamples) + 1j*rng.standard_normal(nsamples)) / numpy.sqrt(2)
+  samples = noise.astype(numpy.complex64)
+  icaos = rng.integers(0, 1 << 24, naircraft)
+  nframes = int(naircraft * replies_per_ac * seconds)
+  starts = numpy.sort(rng.integers(0, nsamples - int(240*spc) - 1, nframes))
+  for start in starts:
+    chips = frame_chips(make_squitter(rng, int(rng.choice(icaos))))
+    #chip n covers samples round(n*spc) up to round((n+1)*spc), so at
+    #fractional rates the chips stay on the grid across the whole frame
+    edges = numpy.round(numpy.arange(len(chips)+1) * spc).astype(int)
+    pulse = numpy.repeat(chips, numpy.diff(edges))
+    amp = 10**((snr_db + rng.uniform(-6, 6)) / 20.)
+    samples[start:start+len(pulse)] += amp * pulse * numpy.exp(1j*rng.uniform(0, 2*numpy.pi))
+  return samples, nframes
+
+class bench_top_block(gr.top_block):
+  def __init__(self, samples, rate, threshold, fused=False):
+    gr.top_block.__init__(self)
+    self.queue = gr.msg_queue()
+    self._src = blocks.vector_source_c(samples.tolist(), False)
+    self._rx_path = air_modes.rx_path(rate, threshold, self.queue, True, False, fused)
+    self.connect(self._src, self._rx_path)
+
+#magnitude and 48-chip noise average, as rx_path would compute them
+def magnitude_streams(samples, rate):
+  spc = rate/2e6
+  pmflen = max(1, int(round(spc)))
+  mag = numpy.abs(samples)**2
+  pmf = numpy.convolve(mag, numpy.ones(pmflen)/pmflen)[:len(mag)]
+  avglen = max(1, int(round(48*spc)))
+  avg = numpy.convolve(pmf, numpy.ones(avglen)/avglen)[:len(pmf)]
+  return pmf.astype(numpy.float32), avg.astype(numpy.float32)
+
+class preamble_top_block(gr.top_block):
+  def __init__(self, samples, rate, threshold):
+    gr.top_block.__init__(self)
+    pmf, avg = magnitude_streams(samples, rate)
+    self._src = blocks.vector_source_f(pmf.tolist(), False)
+    self._avg = blocks.vector_source_f(avg.tolist(), False)
+    self._sync = air_modes.preamble(rate, threshold)
+    self._sink = blocks.null_sink(gr.sizeof_float)
+    self.connect(self._src, (self._sync, 0))
+    self.connect(self._avg, (self._sync, 1))
+    self.connect(self._sync, self._sink)
+
+LATENCY_PATHS = ("msg_queue", "iface", "direct")
+
+#replays samples in real time and publishes the frames on addr, through
+#one of LATENCY_PATHS
+class latency_top_block(gr.top_block):
+  def __init__(self, samples, rate, threshold, fused, context, addr, path,
+               batch_size=1, batch_latency=0):
+    gr.top_block.__init__(self)
+    self._src = blocks.vector_source_c(samples.tolist(), False)
+    self._throttle = blocks.throttle(gr.sizeof_gr_complex, rate)
+    self._queue = gr.msg_queue() if path == "msg_queue" else None
+    self._rx_path = air_modes.rx_path(rate, threshold, self._queue, True, False, fused)
+    self.connect(self._src, self._throttle, self._rx_path)
+    if path == "direct":
+      self.sender = air_modes.pdu_publisher(context, addr, batch_size=batch_size,
+                                            batch_latency=batch_latency)
+      self.msg_connect(self._rx_path, "frames", self.sender, "frames")
+      if batch_size > 1:
+        self._strobe = blocks.message_strobe(pmt.PMT_T, int(max(1, batch_latency*1e3 / 2.0)))
+        self.msg_connect(self._strobe, "strobe", self.sender, "flush")
+    else:
+      self.sender = air_modes.zmq_pubsub_iface(context, subaddr=None, pubaddr=addr,
+                                               batch_size=batch_size, batch_latency=batch_latency)
+      if path == "iface":
+        self._frames = air_modes.pdu_iface_sink(self.sender)
+        self.msg_connect(self._rx_path, "frames", self._frames, "frames")
+      else:
+        self._runner = gru.msgq_runner(self._queue, self.send)
+
+  #as modes_radio used to, reparsing the slicer's text
+  def send(self, msg):
+    record = air_modes.wire.from_ascii(msg.to_string())
+    self.sender[air_modes.wire.topic(record)] = record
+
+def measure_latency(samples, options, path):
+  context = zmq.Context(1)
+  addr = "inproc://bench-latency"
+  tb = latency_top_block(samples, options.rate, options.threshold, options.fused,
+                         context, addr, path, options.batch_size, options.batch_latency*1e-3)
+  sub = context.socket(zmq.SUB)
+  sub.connect(addr)
+  sub.setsockopt(zmq.SUBSCRIBE, air_modes.wire.DL_PREFIX.encode("ascii"))
+  latencies = []
+  done = threading.Event()
+  start = []
+
+  def collect():
+    poller = zmq.Poller()
+    poller.register(sub, zmq.POLLIN)
+    while not done.is_set():
+      if not poller.poll(100):
+        continue
+      msgs = sub.recv_multipart()
+      now = time.time()
+      for msg in msgs[1:]:
+        frame, ecc, rssi, secs, frac, station = air_modes.wire.decode(msg)
+        latencies.append(now - start[0] - (secs + frac))
+
+  collector = threading.Thread(target=collect)
+  collector.start()
+  time.sleep(0.2) #let the subscription propagate
+  start.append(time.time())
+  tb.start(options.chunk)
+  tb.wait()
+  time.sleep(max(0.2, 2*options.batch_latency*1e-3))
+  done.set()
+  collector.join()
+  tb.sender.close()
+  sub.close()
+  return latencies
+
+def main():
+  usage = "%prog: [options]"
+  optparser = OptionParser(option_class=eng_option, usage=usage)
+  optparser.add_option("-r", "--rate", type="eng_float", default=4e6,
+                       help="sample rate [default=%default]")
+  optparser.add_option("-a", "--aircraft", type="int", default=500,
+                       help="number of aircraft in view [default=%default]")
+  optparser.add_option("-n", "--replies", type="eng_float", default=20,
+                       help="replies per second per aircraft [default=%default]")
+  optparser.add_option("-s", "--seconds", type="eng_float", default=2,
+                       help="length of synthesized capture in seconds [default=%default]")
+  optparser.add_option("-S", "--snr", type="eng_float", default=20,
+                       help="mean signal level above noise in dB [default=%default]")
+  optparser.add_option("-T", "--threshold", type="eng_float", default=7.0,
+                       help="pulse detection threshold in dB [default=%default]")
+  optparser.add_option("-p", "--preamble-only", action="store_true", default=False,
+                       help="benchmark the preamble block alone and report ns/sample")
+  optparser.add_option("-F", "--fused", action="store_true", default=False,
+                       help="use the fused demodulator block in rx_path")
+  optparser.add_option("-L", "--latency", action="store_true", default=False,
+                       help="replay in real time and report frame latency to a ZMQ subscriber, through each way of publishing")
+  optparser.add_option("-c", "--chunk", type="int", default=256,
+                       help="with --latency, most samples per block call, as a radio would deliver them [default=%default]")
+  optparser.add_option("-b", "--batch-size", type="int", default=1,
+                       help="with --latency, publish up to this many frames per message [default=%default]")
+  optparser.add_option("-l", "--batch-latency", type="eng_float", default=10,
+                       help="with --latency, maximum batching delay in ms [default=%default]")
+  (options, args) = optparser.parse_args()
+
+  print("Synthesizing %.1fs at %.1fMsps with %i aircraft..." % (options.seconds, options.rate/1e6, options.aircraft))
+  samples, nframes = synthesize(options.rate, options.seconds, options.aircraft,
+                                options.replies, options.snr)
+
+  if options.preamble_only:
+    tb = preamble_top_block(samples, options.rate, options.threshold)
+    start = time.time()
+    tb.run()
+    elapsed = time.time() - start
+    print("Samples:           %i" % len(samples))
+    print("Wall time:         %.3fs" % elapsed)
+    print("ns/sample:         %.2f" % (elapsed * 1e9 / len(samples)))
+    return
+
+  if options.latency:
+    print("Frames injected:   %i" % nframes)
+    for name in LATENCY_PATHS:
+      lat = measure_latency(samples, options, name)
+      if not lat:
+        print("%-10s no frames received" % name)
+        continue
+      lat = sorted(lat)
+      print("%-10s %6i frames   mean %8.1fus   p50 %8.1fus   p99 %8.1fus   max %8.1fus" %
+            (name, len(lat), 1e6*sum(lat)/len(lat), 1e6*lat[len(lat)//2],
+             1e6*lat[min(len(lat)-1, int(0.99*len(lat)))], 1e6*lat[-1]))
+    return
+
+  tb = bench_top_block(samples, options.rate, options.threshold, options.fused)
+  start = time.time()
+  tb.run()
+  elapsed = time.time() - start
+  ndecoded = tb.queue.count()
+
+  print("Frames injected:   %i (%.0f/s)" % (nframes, nframes / options.seconds))
+  print("Frames decoded:    %i" % ndecoded)
+  print("Wall time:         %.3fs" % elapsed)
+  print("Frames/sec:        %.0f" % (ndecoded / elapsed))
+  print("Samples/sec:       %.3fM" % (len(samples) / elapsed / 1e6))
+  print("Real-time factor:  %.2fx" % (options.seconds / elapsed))
+
+if __name__ == '__main__':
+  main()
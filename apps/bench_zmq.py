@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#latency benchmark for zmq_pubsub_iface.
+#sets up the same two hops modes_rx uses -- radio to relay, relay to
+#parser -- and sends timestamped messages through them at a given rate.
+#the relay adds its own arrival time, so the sink can report p50/p99
+#latency for each hop separately.
+
+from gnuradio.eng_option import eng_option
+from optparse import OptionParser
+import struct
+import threading
+import time
+import zmq
+import air_modes
+
+_stamp = struct.Struct("<d")
+
+def percentile(values, p):
+  values = sorted(values)
+  return values[min(len(values)-1, int(p / 100. * len(values)))]
+
+def main():
+  usage = "%prog: [options]"
+  optparser = OptionParser(option_class=eng_option, usage=usage)
+  optparser.add_option("-n", "--count", type="int", default=10000,
+                       help="number of messages to send [default=%default]")
+  optparser.add_option("-r", "--rate", type="eng_float", default=2000,
+                       help="messages per second [default=%default]")
+  optparser.add_option("-t", "--tcp", action="store_true", default=False,
+                       help="use tcp:// on localhost for the hops instead of inproc://")
+  optparser.add_option("-b", "--batch-size", type="int", default=1,
+                       help="batch up to this many messages per hop [default=%default]")
+  optparser.add_option("-l", "--batch-latency", type="eng_float", default=10,
+                       help="maximum batching delay in ms [default=%default]")
+  optparser.add_option("-z", "--compress", type="choice", choices=["zlib", "zstd"], default=None,
+                       help="compress batches on each hop with zlib or zstd")
+  (options, args) = optparser.parse_args()
+
+  if options.tcp:
+    hop1, hop2 = ("tcp://*:5560", "tcp://localhost:5560"), ("tcp://*:5561", "tcp://localhost:5561")
+  else:
+    hop1, hop2 = ("inproc://bench-radio",)*2, ("inproc://bench-relay",)*2
+
+  context = zmq.Context(1)
+  batching = {"batch_size": options.batch_size, "batch_latency": options.batch_latency*1e-3,
+              "compression": options.compress}
+  radio = air_modes.zmq_pubsub_iface(context, subaddr=None, pubaddr=hop1[0], **batching)
+  relay = air_modes.zmq_pubsub_iface(context, subaddr=hop1[1], pubaddr=hop2[0], **batching)
+  sink = air_modes.zmq_pubsub_iface(context, subaddr=hop2[1], pubaddr=None)
+
+  hop1_lat, hop2_lat = [], []
+  done = threading.Event()
+
+  def forward(msg):
+    relay["dl_data"] = msg + _stamp.pack(time.perf_counter())
+
+  def receive(msg):
+    now = time.perf_counter()
+    sent, relayed = _stamp.unpack_from(msg, 0)[0], _stamp.unpack_from(msg, 8)[0]
+    hop1_lat.append(relayed - sent)
+    hop2_lat.append(now - relayed)
+    if len(hop2_lat) == options.count:
+      done.set()
+
+  relay.subscribe("dl_data", forward)
+  sink.subscribe("dl_data", receive)
+  time.sleep(0.5) #let the subscriptions propagate
+
+  interval = 1.0 / options.rate
+  start = time.perf_counter()
+  for i in range(options.count):
+    due = start + i * interval
+    while time.perf_counter() < due:
+      time.sleep(max(0, due - time.perf_counter()))
+    radio["dl_data"] = _stamp.pack(time.perf_counter())
+  done.wait(5)
+
+  print("Received %i of %i messages" % (len(hop2_lat), options.count))
+  for name, lat in (("radio->relay", hop1_lat), ("relay->sink", hop2_lat)):
+    if lat:
+      print("%-13s p50 %8.1fus   p99 %8.1fus" % (name, percentile(lat, 50)*1e6, percentile(lat, 99)*1e6))
+
+  if options.compress is not None:
+    stats = radio.get_stats()
+    print("Compression ratio %.2f, %.1fus CPU per message compressing" %
+          (stats["compression_ratio"], stats["compress_time"] * 1e6 / max(1, stats["sent"])))
+
+  radio.close()
+  relay.close()
+  sink.close()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,44 @@
+/*
+ * Copyright 2026 Nick Foster
+ *
+ * This file is part of gr-air-modes
+ *
+ * gr-air-modes is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * gr-air-modes is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with gr-air-modes; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_AIR_MODES_CRC_H
+#define INCLUDED_AIR_MODES_CRC_H
+
+#include <gr_air_modes/api.h>
+#include <vector>
+
+namespace gr {
+namespace air_modes {
+
+/*!
+ * \brief Mode S parity syndromes for many frames in one call
+ *
+ * frames holds any number of frames of length bytes each, back to back.
+ * Returns the syndrome of each: the CRC of the frame XORed with its
+ * trailing 24-bit parity field, which is zero for a clean DF11/17/18 and
+ * the transponder address for an Address/Parity frame.
+ */
+AIR_MODES_API std::vector<int> syndrome_batch(const std::vector<unsigned char> &frames, int length);
+
+} // namespace air_modes
+} // namespace gr
+
+#endif /* INCLUDED_AIR_MODES_CRC_H */
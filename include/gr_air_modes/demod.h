@@ -0,0 +1,61 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifndef INCLUDED_AIR_MODES_DEMOD_H
+#define INCLUDED_AIR_MODES_DEMOD_H
+
+#include <gnuradio/sync_block.h>
+#include <gr_air_modes/api.h>
+#include <string>
+
+namespace gr {
+namespace air_modes {
+
+/*!
+ * \brief fused mode select magnitude detector
+ * \ingroup block
+ *
+ * Computes the squared magnitude of the input, the pulse matched filter
+ * (a one-chip moving average) and the 48-chip noise floor average in a
+ * single pass. Output 0 is the filtered magnitude and output 1 the noise
+ * average, ready to feed the two inputs of the preamble block.
+ *
+ * iq_format selects the input type: "fc32" (gr_complex), "sc16"
+ * (interleaved int16, as from UHD) or "uc8" (interleaved offset-binary
+ * uint8, as from rtl_sdr). Integer inputs are scaled to +/-1 full scale.
+ */
+class AIR_MODES_API demod : virtual public gr::sync_block
+{
+public:
+    typedef boost::shared_ptr<demod> sptr;
+    static sptr make(float channel_rate, bool use_pmf, const std::string &iq_format = "fc32");
+
+    virtual void set_rate(float channel_rate) = 0;
+    virtual float get_rate(void) = 0;
+    virtual bool get_pmf(void) = 0;
+    virtual std::string get_iq_format(void) = 0;
+};
+
+} // namespace air_modes
+} // namespace gr
+
+#endif /* INCLUDED_AIR_MODES_DEMOD_H */
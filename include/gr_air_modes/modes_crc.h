@@ -23,7 +23,9 @@
 #ifndef INCLUDED_MODES_CRC_H
 #define INCLUDED_MODES_CRC_H
 extern const unsigned int modes_crc_table[112];
-unsigned int modes_check_crc(unsigned char data[], int length);
+unsigned int modes_check_crc(const unsigned char data[], int length);
+unsigned int modes_syndrome(const unsigned char data[], int length);
+void modes_syndrome_batch(const unsigned char *frames, int stride, int length, int count, unsigned int *syndromes);
 bruteResultTypeDef modes_ec_brute(modes_packet &err_packet);
 unsigned next_set_of_n_elements(unsigned x);
 
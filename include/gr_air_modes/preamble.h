@@ -32,6 +32,18 @@ namespace air_modes {
 /*!
  * \brief mode select preamble detection
  * \ingroup block
+ *
+ * Once a preamble is accepted, any other preamble starting within the
+ * holdoff window (default 120us, one long frame) is suppressed, unless
+ * set_stronger_wins() is on and it is threshold_db stronger than the
+ * accepted one. get_num_suppressed() counts suppressed preambles. Without
+ * stronger-wins the window is skipped rather than searched, and a trigger
+ * in it counts as suppressed once its four pulses are over threshold.
+ *
+ * get_stats() returns a dict of running counters: "crossings" (samples
+ * over the pulse threshold), "accepted", "rejected_pulses" (pulses 2-4
+ * missing), "rejected_spaces" (energy between the pulses), "suppressed"
+ * and "work_time" (seconds spent in general_work).
  */
 class AIR_MODES_API preamble : virtual public gr::block
 {
@@ -43,6 +55,12 @@ public:
     virtual void set_threshold(float threshold_db) = 0;
     virtual float get_rate(void) = 0;
     virtual float get_threshold(void) = 0;
+    virtual void set_holdoff(float holdoff_us) = 0;
+    virtual float get_holdoff(void) = 0;
+    virtual void set_stronger_wins(bool stronger_wins) = 0;
+    virtual bool get_stronger_wins(void) = 0;
+    virtual uint64_t get_num_suppressed(void) = 0;
+    virtual pmt::pmt_t get_stats(void) = 0;
 };
 
 } // namespace air_modes
@@ -0,0 +1,60 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifndef INCLUDED_AIR_MODES_REPLAY_SOURCE_H
+#define INCLUDED_AIR_MODES_REPLAY_SOURCE_H
+
+#include <gnuradio/sync_block.h>
+#include <gr_air_modes/api.h>
+#include <string>
+
+namespace gr {
+namespace air_modes {
+
+/*!
+ * \brief memory-mapped capture file replay
+ * \ingroup block
+ *
+ * Plays back items [start_offset, stop_offset) of a capture file, or to
+ * the end of the file if stop_offset is 0. The first item is tagged with
+ * rx_time = start_time + start_offset/sample_rate, so frame timestamps
+ * are absolute. With speed > 0 output is paced at speed times real time;
+ * otherwise it runs as fast as the flowgraph will take it.
+ */
+class AIR_MODES_API replay_source : virtual public gr::sync_block
+{
+public:
+    typedef boost::shared_ptr<replay_source> sptr;
+    static sptr make(const std::string &filename, size_t itemsize,
+                     double sample_rate, double start_time,
+                     uint64_t start_offset, uint64_t stop_offset,
+                     double speed);
+
+    virtual uint64_t get_num_items(void) = 0;
+    virtual void set_speed(double speed) = 0;
+    virtual double get_speed(void) = 0;
+};
+
+} // namespace air_modes
+} // namespace gr
+
+#endif /* INCLUDED_AIR_MODES_REPLAY_SOURCE_H */
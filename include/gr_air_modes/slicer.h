@@ -33,12 +33,41 @@ namespace air_modes {
 /*!
  * \brief mode select slicer
  * \ingroup block
+ *
+ * Frames are posted as ASCII lines to the message queue (if one is given)
+ * and as binary PDUs on the "frames" message port. The PDU metadata dict
+ * holds "syndrome", "reference_level", "timestamp" (a tuple of integer
+ * and fractional seconds) and "sample" (the index of the input sample the
+ * preamble starts on, counted from the start of the stream); the payload
+ * is a u8vector of the frame bytes.
+ *
+ * DF11 and DF17 frames which fail parity are repaired if the syndrome
+ * matches an error in up to set_max_correction() bits (default 1, at most
+ * 2), all of which must have been sliced with low confidence.
+ *
+ * Address/Parity frames (DF0/4/5/16/20/21) are dropped unless the address
+ * recovered from their parity was heard in a clean DF11/DF17 within the
+ * last set_icao_timeout() seconds (default 60). A timeout of zero or less
+ * passes them all through.
+ *
+ * get_stats() returns a dict of running counters: "sliced" (preambles
+ * received), "dropped_zeros", "dropped_lowconf", "dropped_crc" (DF11/DF17
+ * beyond repair), "corrected", "filtered", "published" and "work_time"
+ * (seconds spent in work).
  */
 class AIR_MODES_API slicer : virtual public gr::sync_block
 {
 public:
     typedef boost::shared_ptr<slicer> sptr;
     static sptr make(gr::msg_queue::sptr queue);
+
+    virtual void set_max_correction(int bits) = 0;
+    virtual int get_max_correction(void) = 0;
+    virtual uint64_t get_num_corrected(void) = 0;
+    virtual void set_icao_timeout(float seconds) = 0;
+    virtual float get_icao_timeout(void) = 0;
+    virtual uint64_t get_num_filtered(void) = 0;
+    virtual pmt::pmt_t get_stats(void) = 0;
 };
 
 } //namespace air_modes
@@ -0,0 +1,172 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifdef HAVE_CONFIG_H
+#include "config.h"
+#endif
+
+#include <ciso646>
+#include "demod_impl.h"
+#include <gnuradio/io_signature.h>
+#include <gnuradio/gr_complex.h>
+#include <volk/volk.h>
+#include <algorithm>
+#include <stdexcept>
+#include <string.h>
+#include <math.h>
+
+namespace gr {
+
+air_modes::demod::sptr air_modes::demod::make(float channel_rate, bool use_pmf, const std::string &iq_format) {
+    return gnuradio::get_initial_sptr(new air_modes::demod_impl(channel_rate, use_pmf, iq_format));
+}
+
+static size_t iq_itemsize(const std::string &iq_format) {
+    if(iq_format == "fc32") return sizeof(gr_complex);
+    if(iq_format == "sc16") return 2*sizeof(int16_t);
+    if(iq_format == "uc8")  return 2*sizeof(uint8_t);
+    throw std::invalid_argument("demod: unknown IQ format " + iq_format + " (use fc32, sc16 or uc8)");
+}
+
+air_modes::demod_impl::demod_impl(float channel_rate, bool use_pmf, const std::string &iq_format) :
+    gr::sync_block ("demod",
+                    gr::io_signature::make (1, 1, iq_itemsize(iq_format)),
+                    gr::io_signature::make2 (2, 2, sizeof(float), sizeof(float))) //stream 0 is pulse-filtered magnitude, stream 1 is the noise average
+{
+    d_format_name = iq_format;
+    if(iq_format == "sc16") d_format = FORMAT_SC16;
+    else if(iq_format == "uc8") d_format = FORMAT_UC8;
+    else d_format = FORMAT_FC32;
+
+    //rtl_sdr samples are offset binary around 127.5, so each component
+    //only has 256 possible squares
+    for(int k = 0; k < 256; k++) {
+        float v = (k - 127.5) / 128.0;
+        d_uc8_squares[k] = v*v;
+    }
+
+    d_use_pmf = use_pmf;
+    set_rate(channel_rate);
+    d_pmf_length = d_new_pmf_length;
+    d_avg_length = d_new_avg_length;
+    d_updated = false;
+    set_history(d_pmf_length + d_avg_length - 1);
+}
+
+//filter lengths are rounded to whole samples, same as rx_path does for
+//the discrete blocks. the change takes effect at the top of the next work call.
+void air_modes::demod_impl::set_rate(float channel_rate) {
+    float samples_per_chip = channel_rate / 2000000;
+    d_sample_rate = channel_rate;
+    d_new_pmf_length = d_use_pmf ? std::max(1, int(roundf(samples_per_chip))) : 1;
+    d_new_avg_length = std::max(1, int(roundf(48 * samples_per_chip))); //3 preambles
+    d_updated = true;
+}
+
+float air_modes::demod_impl::get_rate(void) {
+    return d_sample_rate;
+}
+
+bool air_modes::demod_impl::get_pmf(void) {
+    return d_use_pmf;
+}
+
+std::string air_modes::demod_impl::get_iq_format(void) {
+    return d_format_name;
+}
+
+void air_modes::demod_impl::magnitude_squared(const void *in, int n) {
+    switch(d_format) {
+    case FORMAT_SC16: {
+        const int16_t *iq = (const int16_t *) in;
+        const float scale = 1.0 / (32768.0 * 32768.0);
+        for(int k = 0; k < n; k++) {
+            float i = iq[2*k], q = iq[2*k+1];
+            d_mag[k] = (i*i + q*q) * scale;
+        }
+        break;
+    }
+    case FORMAT_UC8: {
+        const uint8_t *iq = (const uint8_t *) in;
+        for(int k = 0; k < n; k++) {
+            d_mag[k] = d_uc8_squares[iq[2*k]] + d_uc8_squares[iq[2*k+1]];
+        }
+        break;
+    }
+    default:
+        volk_32fc_magnitude_squared_32f(&d_mag[0], (const gr_complex *) in, n);
+    }
+}
+
+int air_modes::demod_impl::work(int noutput_items,
+                          gr_vector_const_void_star &input_items,
+                          gr_vector_void_star &output_items)
+{
+    if(d_updated) {
+        d_pmf_length = d_new_pmf_length;
+        d_avg_length = d_new_avg_length;
+        set_history(d_pmf_length + d_avg_length - 1);
+        d_updated = false;
+        return 0; //history has to be updated before we can go on
+    }
+
+    const void *in = input_items[0];
+    float *outmag = (float *) output_items[0];
+    float *outavg = (float *) output_items[1];
+
+    //output n lines up with in[n + history - 1]. we need the magnitude of
+    //everything in the history, and the pulse-filtered magnitude of the last
+    //d_avg_length-1 history samples to prime the noise average.
+    const int nmag = noutput_items + d_pmf_length + d_avg_length - 2;
+    const int npmf = noutput_items + d_avg_length - 1;
+    //the two differ by d_pmf_length-1, which set_rate can shrink, so
+    //each is sized on its own
+    if(d_mag.size() < unsigned(nmag)) d_mag.resize(nmag);
+    if(d_pmf.size() < unsigned(npmf)) d_pmf.resize(npmf);
+
+    magnitude_squared(in, nmag);
+
+    //running sums are restarted every call, so float error never accumulates
+    const float pmf_scale = 1.0 / d_pmf_length;
+    double acc = 0;
+    for(int k = 0; k < d_pmf_length; k++) acc += d_mag[k];
+    d_pmf[0] = acc * pmf_scale;
+    for(int k = 1; k < npmf; k++) {
+        acc += d_mag[k+d_pmf_length-1] - d_mag[k-1];
+        d_pmf[k] = acc * pmf_scale;
+    }
+
+    const float avg_scale = 1.0 / d_avg_length;
+    acc = 0;
+    for(int k = 0; k < d_avg_length; k++) acc += d_pmf[k];
+    outavg[0] = acc * avg_scale;
+    for(int n = 1; n < noutput_items; n++) {
+        acc += d_pmf[n+d_avg_length-1] - d_pmf[n-1];
+        outavg[n] = acc * avg_scale;
+    }
+
+    memcpy(outmag, &d_pmf[d_avg_length-1], noutput_items * sizeof(float));
+
+    return noutput_items;
+}
+
+} //namespace gr
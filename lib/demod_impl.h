@@ -0,0 +1,66 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifndef INCLUDED_AIR_MODES_DEMOD_IMPL_H
+#define INCLUDED_AIR_MODES_DEMOD_IMPL_H
+
+#include <gnuradio/sync_block.h>
+#include <gr_air_modes/api.h>
+#include <gr_air_modes/demod.h>
+#include <vector>
+
+namespace gr {
+namespace air_modes {
+
+class AIR_MODES_API demod_impl : public demod
+{
+private:
+    enum iq_format_t { FORMAT_FC32, FORMAT_SC16, FORMAT_UC8 };
+    iq_format_t d_format;
+    std::string d_format_name;
+    float d_uc8_squares[256];
+    float d_sample_rate;
+    bool d_use_pmf;
+    int d_pmf_length, d_avg_length;
+    int d_new_pmf_length, d_new_avg_length;
+    bool d_updated;
+    std::vector<float> d_mag, d_pmf;
+
+    void magnitude_squared(const void *in, int n);
+
+public:
+    demod_impl(float channel_rate, bool use_pmf, const std::string &iq_format);
+
+    int work (int noutput_items,
+              gr_vector_const_void_star &input_items,
+              gr_vector_void_star &output_items);
+
+    void set_rate(float channel_rate);
+    float get_rate(void);
+    bool get_pmf(void);
+    std::string get_iq_format(void);
+};
+
+} //namespace air_modes
+} //namespace gr
+
+#endif /* INCLUDED_AIR_MODES_DEMOD_IMPL_H */
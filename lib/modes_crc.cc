@@ -27,15 +27,18 @@
 #include <stdio.h>
 #include <gr_air_modes/types.h>
 #include <gr_air_modes/modes_crc.h>
+#include <gr_air_modes/crc.h>
 #include <math.h>
 #include <stdlib.h>
+#include <stdexcept>
 
-unsigned int crc_table[256];
 const unsigned int POLY=0xFFF409;
 
-//generate a bytewise lookup CRC table
+//crc_tables[0] is the usual bytewise table. crc_tables[k][n] is the CRC of
+//byte n followed by k zero bytes, which lets us fold in four bytes per step.
+static unsigned int crc_tables[4][256];
 
-void generate_crc_table(void)
+static void generate_crc_tables(void)
 {
     unsigned int crc = 0;
     for(int n=0; n<256; n++) {
@@ -47,17 +50,63 @@ void generate_crc_table(void)
                 crc = (crc<<1) & 0xFFFFFF;
             }
         }
-        crc_table[n] = crc & 0xFFFFFF;
+        crc_tables[0][n] = crc & 0xFFFFFF;
+    }
+    for(int n=0; n<256; n++) {
+        for(int k=1; k<4; k++) {
+            crc = crc_tables[k-1][n];
+            crc_tables[k][n] = ((crc << 8) ^ crc_tables[0][(crc >> 16) & 0xff]) & 0xFFFFFF;
+        }
     }
 }
 
-//Perform a bytewise CRC check
-unsigned int modes_check_crc(unsigned char data[], int length)
+//build the tables once when the library is loaded
+static struct crc_table_initializer {
+    crc_table_initializer() { generate_crc_tables(); }
+} crc_table_init;
+
+//Perform a CRC check, four bytes at a time (slice-by-4)
+unsigned int modes_check_crc(const unsigned char data[], int length)
 {
-    if(crc_table[1] != POLY) generate_crc_table();
     unsigned int crc=0;
-    for(int i=0; i<length; i++) {
-        crc = crc_table[((crc>>16) ^ data[i]) & 0xff] ^ (crc << 8);
+    int i=0;
+    //the 24-bit register is entirely shifted out by each four byte step
+    for(; i+4<=length; i+=4) {
+        crc = crc_tables[3][((crc>>16) ^ data[i]) & 0xff]
+            ^ crc_tables[2][((crc>>8) ^ data[i+1]) & 0xff]
+            ^ crc_tables[1][(crc ^ data[i+2]) & 0xff]
+            ^ crc_tables[0][data[i+3]];
+    }
+    for(; i<length; i++) {
+        crc = crc_tables[0][((crc>>16) ^ data[i]) & 0xff] ^ (crc << 8);
     }
     return crc & 0xFFFFFF;
 }
+
+//CRC of a whole frame XORed with its trailing 24-bit parity field
+unsigned int modes_syndrome(const unsigned char data[], int length)
+{
+    unsigned int ap = data[length-3] << 16
+                    | data[length-2] << 8
+                    | data[length-1] << 0;
+    return modes_check_crc(data, length-3) ^ ap;
+}
+
+//syndromes for count frames of length bytes each, spaced stride bytes apart
+void modes_syndrome_batch(const unsigned char *frames, int stride, int length, int count, unsigned int *syndromes)
+{
+    for(int n=0; n<count; n++) {
+        syndromes[n] = modes_syndrome(frames + n*stride, length);
+    }
+}
+
+std::vector<int> gr::air_modes::syndrome_batch(const std::vector<unsigned char> &frames, int length)
+{
+    if(length < 4 || frames.size() % length) {
+        throw std::invalid_argument("syndrome_batch: frames must be a whole number of frames of at least 4 bytes");
+    }
+    int count = frames.size() / length;
+    std::vector<unsigned int> syndromes(count);
+    if(count) modes_syndrome_batch(&frames[0], length, length, count, &syndromes[0]);
+    return std::vector<int>(syndromes.begin(), syndromes.end());
+}
@@ -31,6 +31,11 @@
 #include <string.h>
 #include <iostream>
 #include <gnuradio/tags.h>
+#include <volk/volk.h>
+#include <algorithm>
+#include <chrono>
+#include <stdexcept>
+#include <math.h>
 
 namespace gr {
 
@@ -44,6 +49,16 @@ air_modes::preamble_impl::preamble_impl(float channel_rate, float threshold_db)
            gr::io_signature::make (1, 1, sizeof(float))) //the output soft symbols
 {
     d_chip_rate = 2000000; //2Mchips per second
+    d_holdoff_us = 120; //one long frame
+    d_stronger_wins = false;
+    d_last_frame = 0;
+    d_last_peak = 0;
+    d_num_suppressed = 0;
+    d_num_crossings = 0;
+    d_num_accepted = 0;
+    d_num_rejected_pulses = 0;
+    d_num_rejected_spaces = 0;
+    d_work_ns = 0;
     set_rate(channel_rate);
     set_threshold(threshold_db);
 
@@ -54,12 +69,62 @@ air_modes::preamble_impl::preamble_impl(float channel_rate, float threshold_db)
 }
 
 void air_modes::preamble_impl::set_rate(float channel_rate) {
+    if(channel_rate < d_chip_rate) {
+        throw std::out_of_range("preamble: channel rate must be at least 2Msps");
+    }
+    //samples per chip need not be an integer; chip boundaries are rounded
+    //to the nearest sample and frame chips are interpolated on output
     d_samples_per_chip = channel_rate / d_chip_rate;
     d_samples_per_symbol = d_samples_per_chip * 2;
     d_check_width = 120 * d_samples_per_symbol;
     d_sample_rate = channel_rate;
     set_output_multiple(1+d_check_width*2);
-    set_history(d_samples_per_symbol);
+    set_history(ceilf(d_samples_per_symbol));
+    set_holdoff(d_holdoff_us);
+
+    //sample ranges of the four preamble pulses (chips 0, 2, 7 and 9)
+    const int pulse_chips[4] = {0, 2, 7, 9};
+    for(int k=0; k<4; k++) {
+        d_pulse_start[k] = lroundf(pulse_chips[k]*d_samples_per_chip);
+        d_pulse_stop[k] = lroundf((pulse_chips[k]+1)*d_samples_per_chip);
+    }
+}
+
+//after accepting a preamble we ignore any others starting within the
+//holdoff window, since they're almost always the same reply seen again
+//(or its data bits looking like a preamble). if d_stronger_wins is set,
+//a preamble threshold dB stronger than the one we accepted gets through
+//anyway, on the theory that it's a new reply stepping on the old one.
+void air_modes::preamble_impl::set_holdoff(float holdoff_us) {
+    d_holdoff_us = holdoff_us;
+    d_holdoff = std::max(0.0f, holdoff_us * 1e-6f * d_sample_rate);
+}
+
+float air_modes::preamble_impl::get_holdoff(void) {
+    return d_holdoff_us;
+}
+
+void air_modes::preamble_impl::set_stronger_wins(bool stronger_wins) {
+    d_stronger_wins = stronger_wins;
+}
+
+bool air_modes::preamble_impl::get_stronger_wins(void) {
+    return d_stronger_wins;
+}
+
+uint64_t air_modes::preamble_impl::get_num_suppressed(void) {
+    return d_num_suppressed;
+}
+
+pmt::pmt_t air_modes::preamble_impl::get_stats(void) {
+    pmt::pmt_t stats = pmt::make_dict();
+    stats = pmt::dict_add(stats, pmt::intern("crossings"), pmt::from_uint64(d_num_crossings));
+    stats = pmt::dict_add(stats, pmt::intern("accepted"), pmt::from_uint64(d_num_accepted));
+    stats = pmt::dict_add(stats, pmt::intern("rejected_pulses"), pmt::from_uint64(d_num_rejected_pulses));
+    stats = pmt::dict_add(stats, pmt::intern("rejected_spaces"), pmt::from_uint64(d_num_rejected_spaces));
+    stats = pmt::dict_add(stats, pmt::intern("suppressed"), pmt::from_uint64(d_num_suppressed));
+    stats = pmt::dict_add(stats, pmt::intern("work_time"), pmt::from_double(d_work_ns * 1e-9));
+    return stats;
 }
 
 void air_modes::preamble_impl::set_threshold(float threshold_db) {
@@ -85,19 +150,27 @@ static void integrate_and_dump(float *out, const float *in, int chips, int samps
     }
 }
 
-//the preamble pattern in bits
-//fixme goes in .h
-static const bool preamble_bits[] = {1, 0, 1, 0, 0, 0, 0, 1, 0, 1};
-static double correlate_preamble(const float *in, int samples_per_chip) {
-    double corr = 0.0;
-    for(int i=0; i<10; i++) {
-        for(int j=0; j<samples_per_chip;j++)
-            if(preamble_bits[i]) corr += in[i*samples_per_chip+j];
+//the preamble correlation is the sum of the samples under the four pulses.
+//sliding it one sample later adds the sample just past the end of each
+//pulse and drops the first one, so each step of the peak search is O(1)
+//however many samples there are per chip.
+double air_modes::preamble_impl::correlation_step(const float *in) {
+    double delta = 0.0;
+    for(int k=0; k<4; k++) {
+        delta += in[d_pulse_stop[k]] - in[d_pulse_start[k]];
     }
-    return corr;
+    return delta;
 }
 
-static pmt::pmt_t tag_to_timestamp(gr::tag_t tstamp, uint64_t abs_sample_cnt, int rate) {
+//linearly interpolate the input at a fractional sample position
+static inline float interpolate(const float *in, float pos) {
+    int idx = int(pos);
+    float frac = pos - idx;
+    return in[idx] + frac * (in[idx+1] - in[idx]);
+}
+
+//sample_frac is a sub-sample correction (-0.5 to 0.5) to abs_sample_cnt
+static pmt::pmt_t tag_to_timestamp(gr::tag_t tstamp, uint64_t abs_sample_cnt, float sample_frac, int rate) {
     uint64_t last_whole_stamp;
     double last_frac_stamp;
     pmt::pmt_t tstime = pmt::make_tuple(pmt::from_uint64(0), pmt::from_double(0));
@@ -122,13 +195,16 @@ static pmt::pmt_t tag_to_timestamp(gr::tag_t tstamp, uint64_t abs_sample_cnt, in
     //   (abs_sample_cnt - tstamp.offset)/sps is the fractional offset
 
     uint64_t int_offset = (abs_sample_cnt - tstamp.offset)/rate;
-    double frac_offset = ((abs_sample_cnt - tstamp.offset) % rate) / double(rate);
+    double frac_offset = ((abs_sample_cnt - tstamp.offset) % rate + double(sample_frac)) / double(rate);
 
     uint64_t abs_whole = last_whole_stamp + int_offset;
     double abs_frac = last_frac_stamp + frac_offset;
-    if(abs_frac > 1.0f) {
-        abs_frac -= 1.0f;
+    if(abs_frac >= 1.0) {
+        abs_frac -= 1.0;
         abs_whole += 1;
+    } else if(abs_frac < 0.0 and abs_whole > 0) {
+        abs_frac += 1.0;
+        abs_whole -= 1;
     }
 
     tstime = pmt::make_tuple(pmt::from_uint64(abs_whole), pmt::from_double(abs_frac));
@@ -136,6 +212,29 @@ static pmt::pmt_t tag_to_timestamp(gr::tag_t tstamp, uint64_t abs_sample_cnt, in
     return tstime;
 }
 
+//count the preamble triggers in [start, stop) of a holdoff window that's
+//being skipped. they only go through the peak and pulse checks, which is
+//as far as a duplicate trigger on the same reply usually gets anyway.
+int air_modes::preamble_impl::count_triggers(const float *in, const float *inavg, int start, int stop) {
+    const int *pulse_offsets = d_pulse_start;
+    int count = 0;
+    for(int i = start; i < stop; i++) {
+        uint64_t word;
+        while(i+8 <= stop) {
+            memcpy(&word, &d_candidates[i], sizeof(word));
+            if(word) break;
+            i += 8;
+        }
+        if(i >= stop) break;
+        if(!d_candidates[i] or in[i+1] > in[i]) continue;
+        float pulse_threshold = inavg[i] * d_threshold;
+        if( in[i+pulse_offsets[1]] >= pulse_threshold
+        and in[i+pulse_offsets[2]] >= pulse_threshold
+        and in[i+pulse_offsets[3]] >= pulse_threshold ) count++;
+    }
+    return count;
+}
+
 int air_modes::preamble_impl::general_work(int noutput_items,
                           gr_vector_int &ninput_items,
                           gr_vector_const_void_star &input_items,
@@ -145,51 +244,87 @@ int air_modes::preamble_impl::general_work(int noutput_items,
     const float *inavg = (const float *) input_items[1];
 
     int mininputs = std::min(ninput_items[0], ninput_items[1]); //they should be matched but let's be safe
-    //round number of input samples down to nearest d_samples_per_chip
-    //we also subtract off d_samples_per_chip to allow the bit center finder some leeway
-    const int ninputs = std::max(mininputs - (mininputs % int(d_samples_per_chip)) - int(d_samples_per_chip), 0);
+    //we subtract off a chip's worth of samples (rounded up, plus one for the
+    //interpolator) to allow the bit center finder some leeway
+    const int ninputs = std::max(mininputs - int(ceilf(d_samples_per_chip)) - 1, 0);
     if (ninputs <= 0) { consume_each(0); return 0; }
 
+    std::chrono::steady_clock::time_point work_start = std::chrono::steady_clock::now();
+
     float *out = (float *) output_items[0];
 
     if(0) std::cout << "Preamble called with " << ninputs << " samples" << std::endl;
 
-    //fixme move into .h
-    const int pulse_offsets[4] = {    0,
-                                  int(2 * d_samples_per_chip),
-                                  int(7 * d_samples_per_chip),
-                                  int(9 * d_samples_per_chip)
-                                 };
+    const int *pulse_offsets = d_pulse_start;
 
     uint64_t abs_sample_cnt = nitems_read(0);
     std::vector<gr::tag_t> tstamp_tags;
     get_tags_in_range(tstamp_tags, 0, abs_sample_cnt, abs_sample_cnt + ninputs, pmt::string_to_symbol("rx_time"));
-    //tags.back() is the most recent timestamp, then.
-    if(tstamp_tags.size() > 0) {
-        d_timestamp = tstamp_tags.back();
+    std::sort(tstamp_tags.begin(), tstamp_tags.end(), gr::tag_t::offset_compare);
+    //we walk the timestamp tags along with the frames, so each frame gets
+    //stamped from the most recent rx_time tag at or before its preamble
+    std::vector<gr::tag_t>::iterator tstamp_iter = tstamp_tags.begin();
+
+    //first pass: flag every sample above the pulse threshold in one go.
+    //in - inavg*threshold >= 0 becomes a 1 in the candidate mask, so the
+    //scalar validation below only ever looks at flagged samples.
+    if(d_candidates.size() < unsigned(ninputs)) {
+        d_pulse_threshold.resize(ninputs);
+        d_candidates.resize(ninputs);
+    }
+    volk_32f_s32f_multiply_32f(&d_pulse_threshold[0], inavg, d_threshold, ninputs);
+    volk_32f_x2_subtract_32f(&d_pulse_threshold[0], in, &d_pulse_threshold[0], ninputs);
+    volk_32f_binary_slicer_8i(&d_candidates[0], &d_pulse_threshold[0], ninputs);
+
+    const int frame_samples = 240*d_samples_per_chip;
+    int nout = 0; //number of output items produced so far
+    int i = 0;
+    //without stronger-wins nothing inside the holdoff can be accepted,
+    //so pick up where the last call's holdoff window ends
+    if(!d_stronger_wins and d_last_peak > 0 and d_last_frame + d_holdoff > abs_sample_cnt) {
+        i = int(std::min<uint64_t>(d_last_frame + d_holdoff - abs_sample_cnt, ninputs));
+        d_num_suppressed += count_triggers(in, inavg, 0, i);
     }
+    for(; i < ninputs; i++) {
+        //skip over stretches of noise eight samples at a time
+        uint64_t word;
+        while(i+8 <= ninputs) {
+            memcpy(&word, &d_candidates[i], sizeof(word));
+            if(word) break;
+            i += 8;
+        }
+        if(i >= ninputs) break;
+        if(!d_candidates[i]) continue;
 
-    for(int i=0; i < ninputs; i++) {
         float pulse_threshold = inavg[i] * d_threshold;
         if(in[i] > pulse_threshold) { //hey we got a candidate
+            d_num_crossings++;
             if(in[i+1] > in[i]) continue; //wait for the peak
             //check to see the rest of the pulses are there
-            if( in[i+pulse_offsets[1]] < pulse_threshold ) continue;
-            if( in[i+pulse_offsets[2]] < pulse_threshold ) continue;
-            if( in[i+pulse_offsets[3]] < pulse_threshold ) continue;
+            if( in[i+pulse_offsets[1]] < pulse_threshold
+             or in[i+pulse_offsets[2]] < pulse_threshold
+             or in[i+pulse_offsets[3]] < pulse_threshold ) {
+                d_num_rejected_pulses++;
+                continue;
+            }
 
-            //get a more accurate bit center by finding the correlation peak across all four preamble bits
-            bool late, early;
+            //get a more accurate bit center by finding the correlation peak across all four preamble bits.
+            //only the difference between neighboring correlations matters, so we just track those.
+            double early_delta = (i > 0) ? correlation_step(in+i-1) : 0.0; //corr(i) - corr(i-1)
+            double late_delta;                                               //corr(i+1) - corr(i)
             int how_late = 0;
-            do {
-                double now_corr = correlate_preamble(in+i, d_samples_per_chip);
-                double late_corr = correlate_preamble(in+i+1, d_samples_per_chip);
-                double early_corr = correlate_preamble(in+i-1, d_samples_per_chip);
-                late = (late_corr > now_corr);
-                //early = (early_corr > now_corr);
-                if(late) { i++; how_late++; }
-                //if(early && i>0) { std::cout << "EARLY " << i << std::endl; i--; }
-            } while(late and how_late < d_samples_per_chip);// xor early);
+            while((late_delta = correlation_step(in+i)) > 0 and how_late < d_samples_per_chip) {
+                early_delta = late_delta;
+                i++; how_late++;
+            }
+
+            //fit a parabola through the correlation either side of the peak
+            //to place it between samples. this only refines the timestamp.
+            float peak_frac = 0;
+            double curvature = late_delta - early_delta;
+            if(i > 0 and late_delta <= 0 and curvature < 0) {
+                peak_frac = std::min(0.5, std::max(-0.5, -0.5 * (early_delta + late_delta) / curvature));
+            }
 
             if(0) std::cout << "We were " << how_late << " samples late" << std::endl;
 
@@ -202,47 +337,83 @@ int air_modes::preamble_impl::general_work(int noutput_items,
 
             float space_threshold = inavg[i] + (avgpeak - inavg[i])/d_threshold;
             bool valid_preamble = true; //f'in c++
-            for( int j=1.5*d_samples_per_symbol; j<=3*d_samples_per_symbol; j++)
+            //chips 3-6 and 10-15 are spaces. round inward so fractional
+            //chip rates never sample the edge of a neighboring pulse.
+            for( int j=ceilf(3*d_samples_per_chip); j<=floorf(6*d_samples_per_chip); j++)
                 if(in[i+j] > space_threshold) valid_preamble = false;
-            for( int j=5*d_samples_per_symbol; j<=7.5*d_samples_per_symbol; j++)
+            for( int j=ceilf(10*d_samples_per_chip); j<=floorf(15*d_samples_per_chip); j++)
                 if(in[i+j] > space_threshold) valid_preamble = false;
-            if(!valid_preamble) continue;
+            if(!valid_preamble) {
+                d_num_rejected_spaces++;
+                continue;
+            }
 
-            //be sure we've got enough room in the input buffer to copy out a whole packet
-            if(ninputs-i < 240*d_samples_per_chip) {
-                consume_each(std::max(i-1,0));
-                if(0) std::cout << "Preamble consumed " << std::max(i-1,0) << ", returned 0 (no room)" << std::endl;
-                return 0;
+            //overlap suppression
+            if(d_last_peak > 0 and abs_sample_cnt + i < d_last_frame + d_holdoff) {
+                if(!(d_stronger_wins and avgpeak > d_last_peak * d_threshold)) {
+                    d_num_suppressed++;
+                    continue;
+                }
+            }
+
+            //be sure we've got enough room in the input buffer to copy out a whole packet,
+            //and enough room in the output buffer to put it. if not, back up to just before
+            //the peak so we find this preamble again on the next call.
+            if(ninputs-i < frame_samples or noutput_items-nout < 240) {
+                i = std::max(i-1,0);
+                if(0) std::cout << "Preamble out of room with i=" << i << ", produced " << nout << std::endl;
+                break;
             }
 
             //all right i'm prepared to call this a preamble
             for(int j=0; j<240; j++) {
-                out[j] = in[i+int(j*d_samples_per_chip)] - inavg[i];
+                out[nout+j] = interpolate(in+i, j*d_samples_per_chip) - inavg[i];
             }
 
             //get the timestamp of the preamble
-            pmt::pmt_t tstamp = tag_to_timestamp(d_timestamp, abs_sample_cnt + i, d_sample_rate);
+            while(tstamp_iter != tstamp_tags.end() and tstamp_iter->offset <= abs_sample_cnt + i) {
+                d_timestamp = *tstamp_iter++;
+            }
+            pmt::pmt_t tstamp = tag_to_timestamp(d_timestamp, abs_sample_cnt + i, peak_frac, d_sample_rate);
 
-            //now tag the preamble
+            //now tag the preamble with its timestamp and the input sample
+            //it starts on: (whole secs, frac secs, sample index)
             add_item_tag(0, //stream ID
-                     nitems_written(0), //sample
+                     nitems_written(0) + nout, //sample
                      d_key,      //frame_info
-                     tstamp,
+                     pmt::make_tuple(pmt::tuple_ref(tstamp, 0), pmt::tuple_ref(tstamp, 1),
+                                     pmt::from_uint64(abs_sample_cnt + i)),
                      d_me        //block src id
                     );
+            nout += 240;
+            d_num_accepted++;
+
+            d_last_frame = abs_sample_cnt + i;
+            d_last_peak = avgpeak;
+
+            //skip the rest of the holdoff window, the frame's own data
+            //chips included. only with stronger-wins can a preamble in
+            //there be accepted, so only then is it worth walking.
+            if(!d_stronger_wins) {
+                int skip_to = std::max<int64_t>(i, int64_t(d_last_frame + d_holdoff) - int64_t(abs_sample_cnt) - 1);
+                d_num_suppressed += count_triggers(in, inavg, i+1, std::min(skip_to+1, ninputs));
+                i = skip_to;
+            }
+        }
+    }
 
-            //produce only one output per work call -- TODO this should probably change
-            if(0) std::cout << "Preamble consumed " << i+240*d_samples_per_chip << "with i=" << i << ", returned 240" << std::endl;
+    //i can run past ninputs when the peak search walks off the end
+    i = std::min(i, ninputs);
 
-            consume_each(i+240*d_samples_per_chip);
-            return 240;
-        }
+    //hang on to any timestamps in the range we consumed
+    while(tstamp_iter != tstamp_tags.end() and tstamp_iter->offset < abs_sample_cnt + i) {
+        d_timestamp = *tstamp_iter++;
     }
 
-    //didn't get anything this time
-    if(0) std::cout << "Preamble consumed " << ninputs << ", returned 0" << std::endl;
-    consume_each(ninputs);
-    return 0;
+    if(0) std::cout << "Preamble consumed " << i << ", returned " << nout << std::endl;
+    consume_each(i);
+    d_work_ns += std::chrono::duration_cast<std::chrono::nanoseconds>(std::chrono::steady_clock::now() - work_start).count();
+    return nout;
 }
 
 } //namespace gr
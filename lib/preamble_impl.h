@@ -5,6 +5,7 @@
 #include <gnuradio/block.h>
 #include <gr_air_modes/api.h>
 #include <gr_air_modes/preamble.h>
+#include <vector>
 
 namespace gr {
 namespace air_modes {
@@ -22,6 +23,21 @@ private:
     gr::tag_t d_timestamp;
     pmt::pmt_t d_me, d_key;
     int d_sample_rate;
+    std::vector<float> d_pulse_threshold;
+    std::vector<int8_t> d_candidates;
+    int d_pulse_start[4], d_pulse_stop[4];
+    float d_holdoff_us;
+    uint64_t d_holdoff;
+    bool d_stronger_wins;
+    uint64_t d_last_frame;
+    float d_last_peak;
+    uint64_t d_num_suppressed;
+    uint64_t d_num_crossings, d_num_accepted;
+    uint64_t d_num_rejected_pulses, d_num_rejected_spaces;
+    uint64_t d_work_ns;
+
+    double correlation_step(const float *in);
+    int count_triggers(const float *in, const float *inavg, int start, int stop);
 
 public:
     preamble_impl(float channel_rate, float threshold_db);
@@ -35,6 +51,12 @@ public:
     void set_threshold(float threshold_db);
     float get_threshold(void);
     float get_rate(void);
+    void set_holdoff(float holdoff_us);
+    float get_holdoff(void);
+    void set_stronger_wins(bool stronger_wins);
+    bool get_stronger_wins(void);
+    uint64_t get_num_suppressed(void);
+    pmt::pmt_t get_stats(void);
 };
 
 } //namespace air_modes
@@ -0,0 +1,100 @@
+/*
+ * Copyright 2026 Nick Foster
+ *
+ * This file is part of gr-air-modes
+ *
+ * gr-air-modes is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * gr-air-modes is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with gr-air-modes; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+//checks the fused demod against a straightforward magnitude, moving
+//average and noise average, including across a set_rate() from a high
+//rate to a low one mid-stream, which shrinks the filters under buffers
+//sized for the old rate
+
+#include <ciso646>
+#include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
+#include <vector>
+#include <gnuradio/gr_complex.h>
+#include <gr_air_modes/demod.h>
+
+//runs one work call of noutput items and compares both outputs
+static int check_work(gr::air_modes::demod::sptr demod, int noutput, int pmflen, int avglen)
+{
+    int nin = noutput + demod->history() - 1;
+    std::vector<gr_complex> in(nin);
+    for(int k = 0; k < nin; k++) {
+        in[k] = gr_complex(rand() / float(RAND_MAX) - 0.5, rand() / float(RAND_MAX) - 0.5);
+    }
+    std::vector<float> outmag(noutput), outavg(noutput);
+    gr_vector_const_void_star input_items(1, &in[0]);
+    gr_vector_void_star output_items;
+    output_items.push_back(&outmag[0]);
+    output_items.push_back(&outavg[0]);
+
+    int produced = demod->work(noutput, input_items, output_items);
+    if(produced != noutput) {
+        printf("FAIL produced %i of %i items\n", produced, noutput);
+        return 1;
+    }
+
+    //output n lines up with in[n + history - 1]
+    std::vector<double> pmf(nin - pmflen + 1);
+    for(unsigned int j = 0; j < pmf.size(); j++) {
+        double sum = 0;
+        for(int k = 0; k < pmflen; k++) sum += std::norm(in[j+k]);
+        pmf[j] = sum / pmflen;
+    }
+    int failures = 0;
+    for(int n = 0; n < noutput; n++) {
+        double sum = 0;
+        for(int k = 0; k < avglen; k++) sum += pmf[n+k];
+        double mag = pmf[n+avglen-1], avg = sum / avglen;
+        if(fabs(outmag[n] - mag) > 1e-5 or fabs(outavg[n] - avg) > 1e-5) {
+            if(failures++ < 5) {
+                printf("FAIL item %i: mag %f avg %f, expected %f %f\n", n, outmag[n], outavg[n], mag, avg);
+            }
+        }
+    }
+    return failures;
+}
+
+int main(void)
+{
+    int failures = 0;
+    srand(1);
+
+    //8Msps: 4 sample PMF, 192 sample average
+    gr::air_modes::demod::sptr demod = gr::air_modes::demod::make(8e6, true);
+    failures += check_work(demod, 1000, 4, 192);
+
+    //2Msps: 1 sample PMF, 48 sample average. the first call only picks up
+    //the new history; the second needs more PMF output than the 8Msps call
+    //left room for, but no more magnitudes
+    demod->set_rate(2e6);
+    gr_vector_const_void_star no_input;
+    gr_vector_void_star no_output;
+    if(demod->work(0, no_input, no_output) != 0) {
+        printf("FAIL rate change didn't wait for the new history\n");
+        failures++;
+    }
+    failures += check_work(demod, 1146, 1, 48);
+    failures += check_work(demod, 4000, 1, 48);
+
+    printf("%s: %i failures\n", failures ? "FAIL" : "PASS", failures);
+    return failures ? 1 : 0;
+}
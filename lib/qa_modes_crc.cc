@@ -0,0 +1,127 @@
+/*
+ * Copyright 2026 Nick Foster
+ *
+ * This file is part of gr-air-modes
+ *
+ * gr-air-modes is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * gr-air-modes is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with gr-air-modes; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+//checks the slice-by-4 CRC against a plain bitwise one, on known frames
+//and on pseudorandom frames of every length up to a long frame, and the
+//batch syndromes against one modes_syndrome call per frame
+
+#include <ciso646>
+#include <stdio.h>
+#include <stdlib.h>
+#include <vector>
+#include <gr_air_modes/types.h>
+#include <gr_air_modes/modes_crc.h>
+#include <gr_air_modes/crc.h>
+
+//one bit at a time, straight from the generator polynomial
+static unsigned int reference_crc(const unsigned char data[], int length)
+{
+    unsigned int crc = 0;
+    for(int i=0; i<length; i++) {
+        crc ^= data[i] << 16;
+        for(int k=0; k<8; k++) {
+            crc = (crc & 0x800000) ? ((crc<<1) ^ 0xFFF409) : (crc<<1);
+            crc &= 0xFFFFFF;
+        }
+    }
+    return crc;
+}
+
+static int parse_hex(const char *hex, unsigned char *data)
+{
+    int n = 0;
+    for(; hex[2*n] && hex[2*n+1]; n++) {
+        unsigned int byte;
+        sscanf(hex + 2*n, "%2x", &byte);
+        data[n] = byte;
+    }
+    return n;
+}
+
+static const struct {
+    const char *frame;
+    unsigned int syndrome;
+} known_frames[] = {
+    {"8D4840D6202CC371C32CE0576098", 0}, //DF17 identification, KLM1023
+    {"8D40621D58C382D690C8AC2863A7", 0}, //DF17 airborne position
+    {"8D485020994409940838175B284F", 0}, //DF17 airborne velocity
+};
+
+int main(void)
+{
+    int failures = 0;
+    unsigned char data[14];
+
+    for(unsigned int n=0; n<sizeof(known_frames)/sizeof(known_frames[0]); n++) {
+        int length = parse_hex(known_frames[n].frame, data);
+        unsigned int syndrome = modes_syndrome(data, length);
+        if(syndrome != known_frames[n].syndrome) {
+            printf("FAIL %s: syndrome %06x, expected %06x\n",
+                   known_frames[n].frame, syndrome, known_frames[n].syndrome);
+            failures++;
+        }
+    }
+
+    srand(1);
+    for(int trial=0; trial<10000; trial++) {
+        int length = trial % 15;
+        for(int i=0; i<length; i++) data[i] = rand() & 0xff;
+        unsigned int crc = modes_check_crc(data, length);
+        unsigned int expected = reference_crc(data, length);
+        if(crc != expected) {
+            printf("FAIL length %i: crc %06x, expected %06x\n", length, crc, expected);
+            failures++;
+        }
+    }
+
+    //a batch of each frame length, with a known clean frame in the middle
+    const int lengths[2] = {7, 14};
+    for(int l=0; l<2; l++) {
+        int length = lengths[l], count = 100;
+        std::vector<unsigned char> frames(length*count);
+        for(unsigned int i=0; i<frames.size(); i++) frames[i] = rand() & 0xff;
+        if(length == 14) parse_hex(known_frames[0].frame, &frames[50*length]);
+
+        std::vector<unsigned int> batch(count);
+        modes_syndrome_batch(&frames[0], length, length, count, &batch[0]);
+        std::vector<int> wrapped = gr::air_modes::syndrome_batch(frames, length);
+        if(wrapped.size() != unsigned(count)) {
+            printf("FAIL syndrome_batch returned %i syndromes, expected %i\n", int(wrapped.size()), count);
+            failures++;
+            continue;
+        }
+        for(int n=0; n<count; n++) {
+            unsigned int expected = modes_syndrome(&frames[n*length], length);
+            if(batch[n] != expected or unsigned(wrapped[n]) != expected) {
+                printf("FAIL length %i frame %i: batch %06x, syndrome_batch %06x, expected %06x\n",
+                       length, n, batch[n], unsigned(wrapped[n]), expected);
+                failures++;
+            }
+        }
+        if(length == 14 and wrapped[50] != 0) {
+            printf("FAIL syndrome_batch gave %06x for a clean frame\n", wrapped[50]);
+            failures++;
+        }
+    }
+
+    printf("%s: %i failures\n", failures ? "FAIL" : "PASS", failures);
+    return failures ? 1 : 0;
+}
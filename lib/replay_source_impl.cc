@@ -0,0 +1,157 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifdef HAVE_CONFIG_H
+#include "config.h"
+#endif
+
+#include <ciso646>
+#include "replay_source_impl.h"
+#include <gnuradio/io_signature.h>
+#include <algorithm>
+#include <stdexcept>
+#include <thread>
+#include <errno.h>
+#include <math.h>
+#include <string.h>
+
+extern "C"
+{
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+}
+
+namespace gr {
+
+air_modes::replay_source::sptr air_modes::replay_source::make(const std::string &filename, size_t itemsize,
+                                                              double sample_rate, double start_time,
+                                                              uint64_t start_offset, uint64_t stop_offset,
+                                                              double speed) {
+    return gnuradio::get_initial_sptr(new air_modes::replay_source_impl(filename, itemsize, sample_rate, start_time,
+                                                                        start_offset, stop_offset, speed));
+}
+
+air_modes::replay_source_impl::replay_source_impl(const std::string &filename, size_t itemsize,
+                                                  double sample_rate, double start_time,
+                                                  uint64_t start_offset, uint64_t stop_offset,
+                                                  double speed) :
+    gr::sync_block ("replay_source",
+                    gr::io_signature::make (0, 0, 0),
+                    gr::io_signature::make (1, 1, itemsize))
+{
+    d_itemsize = itemsize;
+    d_sample_rate = sample_rate;
+    d_start_time = start_time;
+    d_speed = speed;
+    d_pos = 0;
+
+    d_fd = open(filename.c_str(), O_RDONLY);
+    if(d_fd < 0) {
+        throw std::runtime_error("replay_source: can't open " + filename + ": " + strerror(errno));
+    }
+    struct stat st;
+    if(fstat(d_fd, &st) < 0) {
+        close(d_fd);
+        throw std::runtime_error("replay_source: can't stat " + filename + ": " + strerror(errno));
+    }
+    d_map_size = st.st_size;
+
+    uint64_t file_items = d_map_size / d_itemsize;
+    d_start = std::min(start_offset, file_items);
+    d_stop = (stop_offset == 0) ? file_items : std::min(stop_offset, file_items);
+    if(d_stop < d_start) d_stop = d_start;
+
+    d_base = NULL;
+    if(d_map_size > 0) {
+        void *base = mmap(NULL, d_map_size, PROT_READ, MAP_SHARED, d_fd, 0);
+        if(base == MAP_FAILED) {
+            close(d_fd);
+            throw std::runtime_error("replay_source: can't map " + filename + ": " + strerror(errno));
+        }
+        d_base = (const unsigned char *) base;
+        //we only ever read front to back, so let the kernel read ahead hard
+        madvise(base, d_map_size, MADV_SEQUENTIAL);
+    }
+}
+
+air_modes::replay_source_impl::~replay_source_impl() {
+    if(d_base) munmap((void *) d_base, d_map_size);
+    close(d_fd);
+}
+
+uint64_t air_modes::replay_source_impl::get_num_items(void) {
+    return d_stop - d_start;
+}
+
+void air_modes::replay_source_impl::set_speed(double speed) {
+    //restart the pacing clock from wherever we are now
+    d_speed = speed;
+    d_wall_start = std::chrono::steady_clock::now()
+                 - std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                       std::chrono::duration<double>(d_speed > 0 ? d_pos / (d_sample_rate * d_speed) : 0));
+}
+
+double air_modes::replay_source_impl::get_speed(void) {
+    return d_speed;
+}
+
+int air_modes::replay_source_impl::work(int noutput_items,
+                          gr_vector_const_void_star &input_items,
+                          gr_vector_void_star &output_items)
+{
+    unsigned char *out = (unsigned char *) output_items[0];
+    uint64_t remaining = d_stop - d_start - d_pos;
+    if(remaining == 0) return WORK_DONE;
+
+    if(d_pos == 0) {
+        //stamp the first sample with the time it was captured. whole and
+        //fractional seconds are added up separately, since a double
+        //holding the whole epoch time only resolves about 0.2us.
+        uint64_t rate = uint64_t(llround(d_sample_rate));
+        uint64_t whole = uint64_t(floor(d_start_time)) + d_start / rate;
+        double frac = (d_start_time - floor(d_start_time)) + double(d_start % rate) / d_sample_rate;
+        if(frac >= 1.0) {
+            whole += 1;
+            frac -= 1.0;
+        }
+        add_item_tag(0, nitems_written(0), pmt::string_to_symbol("rx_time"),
+                     pmt::make_tuple(pmt::from_uint64(whole), pmt::from_double(frac)));
+        d_wall_start = std::chrono::steady_clock::now();
+    }
+
+    int n = std::min(uint64_t(noutput_items), remaining);
+    memcpy(out, d_base + (d_start + d_pos) * d_itemsize, n * d_itemsize);
+    d_pos += n;
+
+    //hold off until real time (scaled by the speed factor) catches up
+    if(d_speed > 0) {
+        std::chrono::duration<double> due(d_pos / (d_sample_rate * d_speed));
+        std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - d_wall_start;
+        if(due > elapsed) std::this_thread::sleep_for(due - elapsed);
+    }
+
+    return n;
+}
+
+} //namespace gr
@@ -0,0 +1,67 @@
+/*
+# Copyright 2026 Nick Foster
+# 
+# This file is part of gr-air-modes
+# 
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+*/
+
+#ifndef INCLUDED_AIR_MODES_REPLAY_SOURCE_IMPL_H
+#define INCLUDED_AIR_MODES_REPLAY_SOURCE_IMPL_H
+
+#include <gnuradio/sync_block.h>
+#include <gr_air_modes/api.h>
+#include <gr_air_modes/replay_source.h>
+#include <chrono>
+
+namespace gr {
+namespace air_modes {
+
+class AIR_MODES_API replay_source_impl : public replay_source
+{
+private:
+    size_t d_itemsize;
+    double d_sample_rate;
+    double d_start_time;
+    double d_speed;
+    int d_fd;
+    const unsigned char *d_base;
+    size_t d_map_size;
+    uint64_t d_start, d_stop;
+    uint64_t d_pos;
+    std::chrono::steady_clock::time_point d_wall_start;
+
+public:
+    replay_source_impl(const std::string &filename, size_t itemsize,
+                       double sample_rate, double start_time,
+                       uint64_t start_offset, uint64_t stop_offset,
+                       double speed);
+    ~replay_source_impl();
+
+    int work (int noutput_items,
+              gr_vector_const_void_star &input_items,
+              gr_vector_void_star &output_items);
+
+    uint64_t get_num_items(void);
+    void set_speed(double speed);
+    double get_speed(void);
+};
+
+} //namespace air_modes
+} //namespace gr
+
+#endif /* INCLUDED_AIR_MODES_REPLAY_SOURCE_IMPL_H */
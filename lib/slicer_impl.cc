@@ -34,6 +34,9 @@
 #include <gr_air_modes/modes_crc.h>
 #include <iostream>
 #include <gnuradio/tags.h>
+#include <algorithm>
+#include <chrono>
+#include <vector>
 
 extern "C"
 {
@@ -54,12 +57,154 @@ air_modes::slicer_impl::slicer_impl(gr::msg_queue::sptr queue) :
 {
     //initialize private data here
     d_chip_rate = 2000000; //2Mchips per second
-    d_samples_per_chip = 2;//FIXME this is constant now channel_rate / d_chip_rate;
+    //the preamble block resamples each frame to one sample per chip, so the
+    //slicer is independent of the channel rate
+    d_samples_per_chip = 1;
     d_samples_per_symbol = d_samples_per_chip * 2;
-    d_check_width = 120 * d_samples_per_symbol; //how far you will have to look ahead
+    d_check_width = 120 * d_samples_per_symbol; //how far you will have to look ahead: one whole frame
     d_queue = queue;
 
     set_output_multiple(d_check_width*2); //how do you specify buffer size for sinks?
+
+    //each frame is also published as a binary PDU:
+    //(dict(syndrome, reference_level, timestamp, sample) . u8vector(frame bytes))
+    d_port = pmt::mp("frames");
+    d_syndrome_key = pmt::mp("syndrome");
+    d_reference_key = pmt::mp("reference_level");
+    d_timestamp_key = pmt::mp("timestamp");
+    d_sample_key = pmt::mp("sample");
+    message_port_register_out(d_port);
+
+    //syndrome lookup tables for error correction, built once up front
+    d_max_correction = 1;
+    d_num_corrected = 0;
+    build_syndrome_table(d_short_syndromes, 56);
+    build_syndrome_table(d_long_syndromes, 112);
+
+    //confirmed ICAO addresses, for vetting Address/Parity frames
+    d_icao_timeout = 60;
+    d_next_icao_purge = 0;
+    d_num_filtered = 0;
+    d_num_sliced = 0;
+    d_num_zeros = 0;
+    d_num_lowconf = 0;
+    d_num_crc = 0;
+    d_num_published = 0;
+    d_work_ns = 0;
+}
+
+//the syndrome of a frame with errors is the syndrome of the error pattern
+//alone, since the CRC is linear. we generate the syndrome for each single
+//bit error, then XOR pairs of them together for the two-bit errors.
+void air_modes::slicer_impl::build_syndrome_table(syndrome_table_t &table, int packet_length) {
+    std::vector<unsigned char> error_frames(packet_length*14, 0);
+    std::vector<unsigned int> bit_syndromes(packet_length);
+    for(int j = 0; j < packet_length; j++) {
+        error_frames[j*14 + j/8] = 1 << (7-(j%8));
+    }
+    modes_syndrome_batch(&error_frames[0], 14, packet_length/8, packet_length, &bit_syndromes[0]);
+
+    table.clear();
+    for(int j = 0; j < packet_length; j++) {
+        for(int k = j; k < packet_length; k++) {
+            unsigned int syndrome = (j == k) ? bit_syndromes[j] : (bit_syndromes[j] ^ bit_syndromes[k]);
+            std::pair<int, int> bits(j, (j == k) ? -1 : k);
+            if(table.count(syndrome)) bits = std::make_pair(-1, -1); //ambiguous
+            table[syndrome] = bits;
+        }
+    }
+}
+
+//fix the frame in place if its syndrome points at up to d_max_correction bits,
+//and they're all bits we weren't confident about. the DF field is left alone,
+//since we've already used it to decide the frame length.
+bool air_modes::slicer_impl::correct_errors(modes_packet &pkt, int packet_length) {
+    if(d_max_correction < 1) return false;
+    syndrome_table_t &table = (packet_length == 56) ? d_short_syndromes : d_long_syndromes;
+    syndrome_table_t::const_iterator entry = table.find(pkt.crc);
+    if(entry == table.end()) return false;
+
+    int bits[2] = {entry->second.first, entry->second.second};
+    int nbits = (bits[1] < 0) ? 1 : 2;
+    if(bits[0] < 5 or nbits > d_max_correction) return false;
+
+    for(int b = 0; b < nbits; b++) {
+        bool lowconf = false;
+        for(unsigned int m = 0; m < pkt.numlowconf; m++) {
+            if(pkt.lowconfbits[m] == bits[b]) lowconf = true;
+        }
+        if(!lowconf) return false;
+    }
+
+    for(int b = 0; b < nbits; b++) {
+        pkt.data[bits[b]/8] ^= 1 << (7-(bits[b]%8));
+    }
+    pkt.crc = 0;
+    d_num_corrected++;
+    return true;
+}
+
+//Address/Parity frames overlay the transponder address on the parity field,
+//so the syndrome is the address if the frame is good. we only believe it if
+//we've heard that address in a clean DF11/DF17 within the last d_icao_timeout
+//seconds. stale addresses get swept out once per timeout period.
+bool air_modes::slicer_impl::icao_recently_seen(unsigned int message_type, unsigned int address, double now) {
+    if(d_icao_timeout <= 0) return true;
+    switch(message_type) {
+    case 0: case 4: case 5: case 16: case 20: case 21:
+        break;
+    default:
+        return true;
+    }
+
+    if(now >= d_next_icao_purge) {
+        for(icao_map_t::iterator it = d_icaos.begin(); it != d_icaos.end();) {
+            if(now - it->second > d_icao_timeout) it = d_icaos.erase(it);
+            else it++;
+        }
+        d_next_icao_purge = now + d_icao_timeout;
+    }
+
+    icao_map_t::const_iterator entry = d_icaos.find(address);
+    return entry != d_icaos.end() and now - entry->second <= d_icao_timeout;
+}
+
+void air_modes::slicer_impl::set_icao_timeout(float seconds) {
+    d_icao_timeout = seconds;
+    d_next_icao_purge = 0;
+}
+
+float air_modes::slicer_impl::get_icao_timeout(void) {
+    return d_icao_timeout;
+}
+
+uint64_t air_modes::slicer_impl::get_num_filtered(void) {
+    return d_num_filtered;
+}
+
+pmt::pmt_t air_modes::slicer_impl::get_stats(void) {
+    pmt::pmt_t stats = pmt::make_dict();
+    stats = pmt::dict_add(stats, pmt::intern("sliced"), pmt::from_uint64(d_num_sliced));
+    stats = pmt::dict_add(stats, pmt::intern("dropped_zeros"), pmt::from_uint64(d_num_zeros));
+    stats = pmt::dict_add(stats, pmt::intern("dropped_lowconf"), pmt::from_uint64(d_num_lowconf));
+    stats = pmt::dict_add(stats, pmt::intern("dropped_crc"), pmt::from_uint64(d_num_crc));
+    stats = pmt::dict_add(stats, pmt::intern("corrected"), pmt::from_uint64(d_num_corrected));
+    stats = pmt::dict_add(stats, pmt::intern("filtered"), pmt::from_uint64(d_num_filtered));
+    stats = pmt::dict_add(stats, pmt::intern("published"), pmt::from_uint64(d_num_published));
+    stats = pmt::dict_add(stats, pmt::intern("work_time"), pmt::from_double(d_work_ns * 1e-9));
+    return stats;
+}
+
+void air_modes::slicer_impl::set_max_correction(int bits) {
+    d_max_correction = std::max(0, std::min(bits, 2));
+}
+
+int air_modes::slicer_impl::get_max_correction(void) {
+    return d_max_correction;
+}
+
+uint64_t air_modes::slicer_impl::get_num_corrected(void) {
+    return d_num_corrected;
 }
 
 //this slicer is courtesy of Lincoln Labs. supposedly it is more resistant to mode A/C FRUIT.
@@ -107,6 +252,7 @@ int air_modes::slicer_impl::work(int noutput_items,
     int size = noutput_items - d_check_width; //since it's a sync block, i assume that it runs with ninput_items = noutput_items
 
     if(0) std::cout << "Slicer called with " << size << " samples" << std::endl;
+    std::chrono::steady_clock::time_point work_start = std::chrono::steady_clock::now();
 
     std::vector<gr::tag_t> tags;
     uint64_t abs_sample_cnt = nitems_read(0);
@@ -116,6 +262,7 @@ int air_modes::slicer_impl::work(int noutput_items,
     for(tag_iter = tags.begin(); tag_iter != tags.end(); tag_iter++) {
         uint64_t i = tag_iter->offset - abs_sample_cnt;
         modes_packet rx_packet;
+        d_num_sliced++;
 
         memset(&rx_packet.data, 0x00, 14 * sizeof(unsigned char));
         memset(&rx_packet.lowconfbits, 0x00, 24 * sizeof(unsigned char));
@@ -130,11 +277,11 @@ int air_modes::slicer_impl::work(int noutput_items,
                                    + in[i+7]
                                    + in[i+9]) / 4.0;
 
-        i += 16; //move on up to the first bit of the packet data
+        i += 8 * d_samples_per_symbol; //move on up to the first bit of the packet data
         //now let's slice the header so we can determine if it's a short pkt or a long pkt
         unsigned char pkt_hdr = 0;
         for(int j=0; j < 5; j++) {
-            slice_result_t slice_result = llslicer(in[i+j*2], in[i+j*2+1], rx_packet.reference_level);
+            slice_result_t slice_result = llslicer(in[i+j*d_samples_per_symbol], in[i+j*d_samples_per_symbol+d_samples_per_chip], rx_packet.reference_level);
             if(slice_result.decision) pkt_hdr += 1 << (4-j);
         }
         if(pkt_hdr == 16 or pkt_hdr == 17 or pkt_hdr == 20 or pkt_hdr == 21) rx_packet.type = Long_Packet;
@@ -144,7 +291,7 @@ int air_modes::slicer_impl::work(int noutput_items,
         //it's slice time!
         //TODO: don't repeat your work here, you already have the first 5 bits
         for(int j = 0; j < packet_length; j++) {
-            slice_result_t slice_result = llslicer(in[i+j*2], in[i+j*2+1], rx_packet.reference_level);
+            slice_result_t slice_result = llslicer(in[i+j*d_samples_per_symbol], in[i+j*d_samples_per_symbol+d_samples_per_chip], rx_packet.reference_level);
 
             //put the data into the packet
             if(slice_result.decision) {
@@ -163,25 +310,50 @@ int air_modes::slicer_impl::work(int noutput_items,
         for(int m = 0; m < 14; m++) {
             if(rx_packet.data[m]) zeroes = 0;
         }
-        if(zeroes) {continue;} //toss it
+        if(zeroes) {d_num_zeros++; continue;} //toss it
 
         rx_packet.message_type = (rx_packet.data[0] >> 3) & 0x1F; //get the message type to make decisions on ECC methods
 
-        if(rx_packet.type == Short_Packet && rx_packet.message_type != 11 && rx_packet.numlowconf > 0) {continue;}
-        if(rx_packet.message_type == 11 && rx_packet.numlowconf >= 10) {continue;}
+        if(rx_packet.type == Short_Packet && rx_packet.message_type != 11 && rx_packet.numlowconf > 0) {d_num_lowconf++; continue;}
+        if(rx_packet.message_type == 11 && rx_packet.numlowconf >= 10) {d_num_lowconf++; continue;}
+
+        rx_packet.crc = modes_syndrome(rx_packet.data, packet_length/8);
 
-        rx_packet.crc = modes_check_crc(rx_packet.data, (packet_length/8)-3);
-        unsigned int ap = rx_packet.data[packet_length/8-3] << 16
-                        | rx_packet.data[packet_length/8-2] << 8
-                        | rx_packet.data[packet_length/8-1] << 0;
-        rx_packet.crc ^= ap;
+        //the preamble tag is (whole secs, frac secs, input sample index)
+        pmt::pmt_t tstamp = pmt::make_tuple(pmt::tuple_ref(tag_iter->value, 0), pmt::tuple_ref(tag_iter->value, 1));
+        double now = pmt::to_uint64(pmt::tuple_ref(tstamp, 0)) + pmt::to_double(pmt::tuple_ref(tstamp, 1));
 
         //crc for packets that aren't type 11 or type 17 is encoded with the transponder ID, which we don't know
-        //therefore we toss 'em if there's syndrome
+        //therefore we toss 'em if there's syndrome (after trying to fix 'em)
         //crc for the other short packets is usually nonzero, so they can't really be trusted that far
-        if(rx_packet.crc && (rx_packet.message_type == 11 || rx_packet.message_type == 17)) {continue;}
+        //unless the address they decode to is one we've recently confirmed
+        if(rx_packet.message_type == 11 || rx_packet.message_type == 17) {
+            if(rx_packet.crc == 0) {
+                //clean parity, so the AA field is a confirmed address. with
+                //the filter off nothing would ever purge the map, so don't fill it
+                if(d_icao_timeout > 0) {
+                    unsigned int icao = rx_packet.data[1] << 16 | rx_packet.data[2] << 8 | rx_packet.data[3];
+                    d_icaos[icao] = now;
+                }
+            } else if(!correct_errors(rx_packet, packet_length)) {
+                d_num_crc++;
+                continue;
+            }
+        } else if(!icao_recently_seen(rx_packet.message_type, rx_packet.crc, now)) {
+            d_num_filtered++;
+            continue;
+        }
+
+        pmt::pmt_t meta = pmt::make_dict();
+        meta = pmt::dict_add(meta, d_syndrome_key, pmt::from_long(rx_packet.crc));
+        meta = pmt::dict_add(meta, d_reference_key, pmt::from_double(rx_packet.reference_level));
+        meta = pmt::dict_add(meta, d_timestamp_key, tstamp);
+        meta = pmt::dict_add(meta, d_sample_key, pmt::tuple_ref(tag_iter->value, 2));
+        message_port_pub(d_port, pmt::cons(meta, pmt::init_u8vector(packet_length/8, rx_packet.data)));
+        d_num_published++;
 
-        pmt::pmt_t tstamp = tag_iter->value;
+        //the string format is only built if somebody's listening on the queue
+        if(!d_queue) continue;
 
         d_payload.str("");
         for(int m = 0; m < packet_length/8; m++) {
@@ -194,6 +366,7 @@ int air_modes::slicer_impl::work(int noutput_items,
         d_queue->handle(msg);
     }
     if(0) std::cout << "Slicer consumed " << size << ", returned " << size << std::endl;
+    d_work_ns += std::chrono::duration_cast<std::chrono::nanoseconds>(std::chrono::steady_clock::now() - work_start).count();
     return size;
 }
 
@@ -27,10 +27,20 @@
 #include <gnuradio/msg_queue.h>
 #include <gr_air_modes/api.h>
 #include <gr_air_modes/slicer.h>
+#include <gr_air_modes/types.h>
+#include <unordered_map>
+#include <utility>
 
 namespace gr {
 namespace air_modes {
 
+//maps a CRC syndrome to the bit position(s) whose error would cause it.
+//the second position is -1 for single-bit errors; both are -1 if more than
+//one error pattern gives the same syndrome.
+typedef std::unordered_map<unsigned int, std::pair<int, int> > syndrome_table_t;
+//maps a confirmed ICAO address to the stream time (in seconds) it was last heard
+typedef std::unordered_map<unsigned int, double> icao_map_t;
+
 class AIR_MODES_API slicer_impl : public slicer
 {
 private:
@@ -41,6 +51,22 @@ private:
     gr::tag_t d_timestamp;
     gr::msg_queue::sptr d_queue;
     std::ostringstream d_payload;
+    pmt::pmt_t d_port, d_syndrome_key, d_reference_key, d_timestamp_key, d_sample_key;
+    syndrome_table_t d_short_syndromes, d_long_syndromes;
+    int d_max_correction;
+    uint64_t d_num_corrected;
+
+    void build_syndrome_table(syndrome_table_t &table, int packet_length);
+    bool correct_errors(modes_packet &pkt, int packet_length);
+
+    icao_map_t d_icaos;
+    float d_icao_timeout;
+    double d_next_icao_purge;
+    uint64_t d_num_filtered;
+    uint64_t d_num_sliced, d_num_zeros, d_num_lowconf, d_num_crc, d_num_published;
+    uint64_t d_work_ns;
+
+    bool icao_recently_seen(unsigned int message_type, unsigned int address, double now);
 
 public:
     slicer_impl(gr::msg_queue::sptr queue);
@@ -48,6 +74,14 @@ public:
     int work (int noutput_items,
               gr_vector_const_void_star &input_items,
               gr_vector_void_star &output_items);
+
+    void set_max_correction(int bits);
+    int get_max_correction(void);
+    uint64_t get_num_corrected(void);
+    void set_icao_timeout(float seconds);
+    float get_icao_timeout(void);
+    uint64_t get_num_filtered(void);
+    pmt::pmt_t get_stats(void);
 };
 
 } //namespace air_modes
@@ -41,7 +41,7 @@ try:
 except ImportError:
     raise RuntimeError("PyZMQ not found! Please install libzmq and PyZMQ to run gr-air-modes")
 
-from .rx_path import rx_path
+from .rx_path import rx_path, iq_itemsize
 from .zmq_socket import zmq_pubsub_iface
 from .parse import *
 from .msprint import output_print
@@ -50,6 +50,13 @@ from .sbs1 import output_sbs1
 from .kml import output_kml, output_jsonp
 from .raw_server import raw_server
 from .radio import modes_radio
+from .pdu_publisher import pdu_sink, pdu_iface_sink, pdu_publisher
+from .batch import batch_decoder
+from .shm import output_shm, shm_reader
+from . import wire
+from .aggregator import frame_aggregator
+from .beast import output_beast, output_avr, input_beast, input_avr
+from .aio import aio_relay, aio_output, aio_adapter, aio_server, aio_sbs1, aio_beast, aio_avr, aio_kml, aio_jsonp
 from .exceptions import *
 from .modes_types import *
 from .altitude import *
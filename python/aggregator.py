@@ -0,0 +1,125 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#merges dl_data from several stations before it reaches the parser.
+#when overlapping stations hear the same reply, each sends an identical
+#frame within a few tens of milliseconds of the others. the aggregator
+#indexes pending frames by their bytes; a copy from a new station arriving
+#within the window is folded into the pending one, and when the window
+#closes a single report goes out listing every station that heard it and
+#at what level. the strongest station supplies the report's rssi and
+#timestamp. a second copy from the same station is a genuinely new reply
+#(e.g. a DF11 to another interrogator) and is passed on separately.
+#
+#stations are identified by the station id in binary wire records, so
+#each feeder should run with its own --station-id.
+#
+#closed windows are flushed on every arrival and by a timer: a thread by
+#default, or with threaded=False, the run() coroutine on an asyncio loop.
+#reports are published with the lock held, so outputs never see two at once.
+
+import asyncio
+import collections
+import threading
+import time
+from air_modes import wire
+from air_modes.parse import publish_rssi_report
+from air_modes.sbs1 import dumb_task_runner
+
+class frame_aggregator:
+  def __init__(self, pub, window=0.2, threaded=True):
+    self._pub = pub
+    self._window = window
+    self._lock = threading.Lock()
+    self._pending = {}                   #frame bytes -> [deadline, ecc, [(station, rssi, secs, frac)...]]
+    self._expiry = collections.deque()  #(deadline, frame bytes), oldest first
+    self._start = time.time()
+    self._ingested = collections.Counter()
+    self._duplicates = collections.Counter()
+    self._forwarded = 0
+    self._runner = dumb_task_runner(self.flush, window / 2.0) if threaded else None
+
+  #subscribe this with subscribe_dl in place of make_parser
+  def __call__(self, message):
+    try:
+      frame, ecc, rssi, secs, frac, station = wire.decode_message(message)
+    except ValueError:
+      return
+    now = time.time()
+    with self._lock:
+      self._ingested[station] += 1
+      entry = self._pending.get(frame)
+      if entry is not None and station not in [h[0] for h in entry[2]]:
+        self._duplicates[station] += 1
+        entry[2].append((station, rssi, secs, frac))
+        return
+      if entry is not None:
+        #same station again: send what we have and start over
+        self._emit(frame, entry)
+      self._pending[frame] = [now + self._window, ecc, [(station, rssi, secs, frac)]]
+      self._expiry.append((now + self._window, frame))
+    self.flush(now)
+
+  #forward every frame whose window has closed
+  def flush(self, now=None):
+    if now is None:
+      now = time.time()
+    with self._lock:
+      while self._expiry and self._expiry[0][0] <= now:
+        deadline, frame = self._expiry.popleft()
+        entry = self._pending.get(frame)
+        #the frame may have been sent and restarted since this deadline was queued
+        if entry is not None and entry[0] == deadline:
+          del self._pending[frame]
+          self._emit(frame, entry)
+
+  def _emit(self, frame, entry):
+    heard = entry[2]
+    station, rssi, secs, frac = max(heard, key=lambda h: h[1])
+    self._forwarded += 1
+    publish_rssi_report(self._pub, int.from_bytes(frame, 'big'), entry[1], rssi, secs, frac,
+                        [(h[0], h[1]) for h in heard])
+
+  def get_stats(self):
+    """Per-station frames ingested, ingest rate (frames/s) and the fraction
+    of its frames which duplicated another station's, plus totals."""
+    elapsed = max(time.time() - self._start, 1e-9)
+    with self._lock:
+      stations = dict((station, {"ingested": n,
+                                 "rate": n / elapsed,
+                                 "duplicate_ratio": float(self._duplicates[station]) / n})
+                      for station, n in self._ingested.items())
+      total = sum(self._ingested.values())
+      return {"stations": stations,
+              "ingested": total,
+              "forwarded": self._forwarded,
+              "duplicate_ratio": float(sum(self._duplicates.values())) / total if total else 0.0,
+              "pending": len(self._pending)}
+
+  async def run(self):
+    while True:
+      await asyncio.sleep(self._window / 2.0)
+      self.flush()
+
+  def close(self):
+    if self._runner is not None:
+      self._runner.close()
+    self.flush(float("inf"))
@@ -0,0 +1,215 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#asyncio runtime for the relay and outputs.
+#instead of a zmq_pubsub_iface thread calling outputs which run threads of
+#their own, everything here is a coroutine on one event loop: the relay
+#reads with zmq.asyncio and publishes parsed reports to an ordinary pubsub,
+#each output queues the reports it wants and handles them in its own task,
+#and socket servers use asyncio streams, so a slow TCP client only ever
+#costs its own write buffer.
+
+import asyncio
+import sqlite3
+import zmq
+import zmq.asyncio
+from gnuradio.gr.pubsub import pubsub
+from air_modes.exceptions import *
+from air_modes.sbs1 import sbs1_formatter, SBS1_TYPES
+from air_modes.kml import kml_writer, jsonp_writer
+from air_modes.zmq_socket import is_compressed, unpack_compressed, prefix_dispatch
+from air_modes.beast import beast_encode, avr_encode
+from air_modes.parse import subscribe_dl, _type_topics
+
+#subscribe-only counterpart of zmq_pubsub_iface. the context must share
+#the radio's underlying context for inproc:// addresses to connect, e.g.
+#zmq.asyncio.Context.shadow(context.underlying).
+class aio_relay(prefix_dispatch):
+    def __init__(self, context, subaddr):
+        self._socket = context.socket(zmq.SUB)
+        if type(subaddr) is str:
+            subaddr = [subaddr]
+        for addr in subaddr:
+            self._socket.connect(addr.encode('ascii'))
+        self._pubsub = pubsub()
+        self._batch_pubsub = pubsub()
+        self._batched_keys = frozenset()
+        self._keys = frozenset()
+        self._routes = {}
+
+    def subscribe(self, key, subscriber, batched=False):
+        self._socket.setsockopt(zmq.SUBSCRIBE, key.encode('ascii'))
+        if batched:
+            self._batch_pubsub.subscribe(key.encode('ascii'), subscriber)
+        else:
+            self._pubsub.subscribe(key.encode('ascii'), subscriber)
+        self._subscribed(key.encode('ascii'), batched)
+
+    async def run(self):
+        while True:
+            msgs = await self._socket.recv_multipart()
+            address = msgs.pop(0)
+            if is_compressed(msgs):
+                try:
+                    raw, msgs = unpack_compressed(msgs[0], msgs[1])
+                except ValueError:
+                    continue
+            self._dispatch(address, msgs)
+
+    def close(self):
+        self._socket.close()
+
+#base for outputs which run as coroutines. reports published under keys
+#are queued, and run() hands them to handle() one at a time. if the output
+#falls maxsize reports behind, new ones are dropped and counted.
+class aio_output:
+    def __init__(self, pub, keys, maxsize=10000):
+        self._queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        for key in keys:
+            pub.subscribe(key, self._put)
+
+    def _put(self, msg):
+        try:
+            self._queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self):
+        while True:
+            msg = await self._queue.get()
+            await self.handle(msg)
+
+    async def handle(self, msg):
+        raise NotImplementedError
+
+#runs any of the callback-style outputs (output_print, output_sql,
+#output_flightgear, output_shm...) as a coroutine. factory is called with
+#a private pubsub, which is fed the same keys publish_report uses.
+class aio_adapter(aio_output):
+    def __init__(self, pub, factory, maxsize=10000):
+        aio_output.__init__(self, pub, ["modes_dl"], maxsize)
+        self._pub = pubsub()
+        self.output = factory(self._pub)
+
+    async def handle(self, msg):
+        self._pub["modes_dl"] = msg
+        self._pub[_type_topics[msg.data.get_type()]] = msg
+
+#TCP server on asyncio streams; handle() works out what to send and
+#calls broadcast(). a client more than max_buffer bytes behind is
+#disconnected rather than allowed to hold everyone else up.
+class aio_server(aio_output):
+    def __init__(self, port, pub, keys, max_buffer=1<<20):
+        aio_output.__init__(self, pub, keys)
+        self._port = port
+        self._max_buffer = max_buffer
+        self._writers = set()
+        self._server = None
+
+    async def _client(self, reader, writer):
+        self._writers.add(writer)
+        print("Connections: ", len(self._writers))
+        try:
+            while await reader.read(4096):
+                pass #nothing to hear from clients, just wait for them to go
+        except ConnectionError:
+            pass
+        finally:
+            self._drop(writer)
+
+    def _drop(self, writer):
+        if writer in self._writers:
+            self._writers.discard(writer)
+            writer.close()
+            print("Connections: ", len(self._writers))
+
+    def broadcast(self, data):
+        for writer in list(self._writers):
+            if writer.transport.get_write_buffer_size() > self._max_buffer:
+                self._drop(writer)
+            else:
+                writer.write(data)
+
+    async def run(self):
+        self._server = await asyncio.start_server(self._client, port=self._port, reuse_address=True)
+        await aio_output.run(self)
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._writers):
+            self._drop(writer)
+
+class aio_sbs1(sbs1_formatter, aio_server):
+    def __init__(self, cprdec, port, pub, max_buffer=1<<20):
+        sbs1_formatter.__init__(self, cprdec)
+        aio_server.__init__(self, port, pub, ["type%i_dl" % i for i in SBS1_TYPES], max_buffer)
+
+    async def handle(self, msg):
+        try:
+            sbs1_msg = self.parse(msg)
+        except ADSBError:
+            return
+        if sbs1_msg is not None:
+            self.broadcast(sbs1_msg.encode('utf-8'))
+
+#Beast and AVR servers, fed dl_data from the aio_relay rather than reports
+class aio_frames(aio_server):
+    def __init__(self, port, relay, encode, max_buffer=1<<20):
+        aio_server.__init__(self, port, relay, [], max_buffer)
+        subscribe_dl(relay, self._put)
+        self._encode = encode
+
+    async def handle(self, msg):
+        if not self._writers:
+            return
+        try:
+            self.broadcast(self._encode(msg))
+        except (ValueError, KeyError):
+            pass
+
+class aio_beast(aio_frames):
+    def __init__(self, port, relay, max_buffer=1<<20):
+        aio_frames.__init__(self, port, relay, beast_encode, max_buffer)
+
+class aio_avr(aio_frames):
+    def __init__(self, port, relay, max_buffer=1<<20):
+        aio_frames.__init__(self, port, relay, avr_encode, max_buffer)
+
+#KML (or, with aio_jsonp, JSONP) regenerated from the database every timeout seconds
+class aio_kml(kml_writer):
+    def __init__(self, filename, dbname, localpos, lock, timeout=5):
+        kml_writer.__init__(self, filename, dbname, localpos, lock)
+        self._timeout = timeout
+
+    async def run(self):
+        self._db = sqlite3.connect(self._dbname)
+        try:
+            while True:
+                await asyncio.sleep(self._timeout)
+                self.writekml()
+        finally:
+            self._db.close()
+            self._db = None
+
+class aio_jsonp(jsonp_writer, aio_kml):
+    pass
@@ -0,0 +1,151 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#offline decoding of large captures, split across processes.
+#the capture is cut into chunks, each of which "owns" a disjoint range of
+#samples and is decoded by its own rx_path in its own process. every chunk
+#also reads a margin on either side of the range it owns: enough before it
+#for the noise average, holdoff and ICAO filter to reach steady state, and
+#enough after it to finish the last frame that starts inside it. a frame is
+#kept only by the chunk owning the sample its preamble starts on, which the
+#slicer's PDUs carry as an integer, so once the chunks come back in order
+#the frames are already in timestamp order.
+
+from gnuradio import gr
+import air_modes
+from air_modes.pdu_publisher import pdu_sink
+import multiprocessing
+import os
+import pmt
+
+#longest frame including preamble, and the 48-chip noise floor average
+MAX_FRAME_TIME = 120e-6
+AVG_WINDOW_TIME = 24e-6
+#frames from adjacent chunks this many samples apart are the same frame
+DUP_SAMPLES = 2
+
+_sample = pmt.intern("sample")
+
+#keeps (sample index, frame string) for each frame the slicer publishes
+class _chunk_sink(pdu_sink):
+    def __init__(self):
+        pdu_sink.__init__(self, "batch_chunk_sink", 0, "ascii")
+        self.frames = []
+
+    def handle_frame(self, pdu):
+        meta = pmt.car(pdu)
+        data = bytes(pmt.u8vector_elements(pmt.cdr(pdu)))
+        sample = pmt.to_uint64(pmt.dict_ref(meta, _sample, pmt.PMT_NIL))
+        self.frames.append((sample, self._record(meta, data).decode('ascii')))
+
+class _chunk_top_block(gr.top_block):
+    def __init__(self, job):
+        gr.top_block.__init__(self)
+        self._src = air_modes.replay_source(job["filename"],
+                                            air_modes.iq_itemsize[job["iq_format"]],
+                                            job["rate"], job["capture_time"],
+                                            job["read_start"], job["read_stop"], 0)
+        self._rx_path = air_modes.rx_path(job["rate"], job["threshold"], None,
+                                          job["pmf"], False, job["fused"], job["iq_format"])
+        self._rx_path.set_max_correction(job["correct"])
+        self._rx_path.set_icao_timeout(job["icao_timeout"])
+        self._rx_path.set_holdoff(job["holdoff"])
+        self.sink = _chunk_sink()
+        self.connect(self._src, self._rx_path)
+        self.msg_connect(self._rx_path, "frames", self.sink, "frames")
+
+def decode_chunk(job):
+    """Decode one chunk. Returns (sample index, frame string) for each frame
+    whose preamble starts in the range the chunk owns, in timestamp order."""
+    tb = _chunk_top_block(job)
+    tb.run()
+
+    #the replay source counts samples from read_start
+    frames = []
+    for sample, line in tb.sink.frames:
+        sample += job["read_start"]
+        if job["own_start"] <= sample < job["own_stop"]:
+            frames.append((sample, line))
+    frames.sort(key=lambda f: f[0])
+    return frames
+
+def plan_chunks(nitems, chunk_items, preroll_items, postroll_items):
+    """Split nitems into (read_start, read_stop, own_start, own_stop) tuples."""
+    chunks = []
+    for own_start in range(0, nitems, chunk_items):
+        own_stop = min(own_start + chunk_items, nitems)
+        chunks.append((max(own_start - preroll_items, 0),
+                       min(own_stop + postroll_items, nitems),
+                       own_start, own_stop))
+    return chunks
+
+class batch_decoder:
+    def __init__(self, filename, rate, iq_format="fc32", capture_time=0,
+                 threshold=7.0, correct=1, icao_timeout=60, holdoff=120,
+                 fused=True, chunk_time=30, warmup_time=2, processes=None, pmf=False):
+        if rate < 2e6:
+            raise NotImplementedError("Batch decoding below 2Msps not currently supported.")
+        self._processes = processes or os.cpu_count()
+        nitems = os.path.getsize(filename) // air_modes.iq_itemsize[iq_format]
+        self.duration = float(nitems) / rate
+
+        #the ICAO filter needs to have heard DF11/DF17 from the aircraft in
+        #view before it will pass their DF4/5/20/21 frames, so when it is on,
+        #each chunk also replays a warmup period ahead of its range
+        margin = max(MAX_FRAME_TIME, holdoff*1e-6) + AVG_WINDOW_TIME
+        preroll = margin + (warmup_time if icao_timeout > 0 else 0)
+        chunk_items = max(int(chunk_time * rate), 1)
+        chunks = plan_chunks(nitems, chunk_items,
+                             int(preroll * rate) + 1, int(margin * rate) + 1)
+
+        job = {"filename": filename, "rate": rate, "iq_format": iq_format,
+               "capture_time": capture_time, "threshold": threshold,
+               "correct": correct, "icao_timeout": icao_timeout,
+               "holdoff": holdoff, "fused": fused, "pmf": pmf}
+        self._jobs = [dict(job, read_start=c[0], read_stop=c[1], own_start=c[2], own_stop=c[3])
+                      for c in chunks]
+        self._boundary = int(margin * rate) + DUP_SAMPLES
+
+    def __iter__(self):
+        """Decoded frame strings, in timestamp order."""
+        #each process builds its own flowgraph, so don't fork one that
+        #might already have GNU Radio threads running
+        ctx = multiprocessing.get_context("spawn")
+        pool = ctx.Pool(self._processes)
+        try:
+            recent = {}
+            for frames in pool.imap(decode_chunk, self._jobs):
+                #the chunk before may have settled on a preamble a sample
+                #or so away from this one's, leaving both copies of a frame
+                #on the boundary owned; drop the second
+                for sample, line in frames:
+                    data = line.split(" ", 1)[0]
+                    prev = recent.get(data)
+                    if prev is not None and abs(sample - prev) <= DUP_SAMPLES:
+                        continue
+                    recent[data] = sample
+                    yield line
+                if frames:
+                    last = frames[-1][0]
+                    recent = dict((d, s) for d, s in recent.items() if last - s < self._boundary)
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,276 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#Mode-S Beast binary and AVR raw frame servers and clients.
+#
+#the servers take dl_data straight off the relay, so frames go out as
+#the slicer saw them without being parsed. the clients connect to another
+#receiver's Beast or AVR port and publish what it sends as dl_data wire
+#records, so everything downstream treats them like frames from our own
+#radio.
+#
+#Beast: 0x1a, type ('2' short, '3' long, '1' Mode A/C), 48-bit timestamp
+#in 12MHz ticks, signal level byte, frame. any 0x1a after the type is
+#sent twice.
+#AVR: "*<hex frame>;" per line, or "@<12 hex digit timestamp><hex frame>;".
+#
+#a remote receiver's timestamps count from wherever its own clock started,
+#so reports from a client are stamped in that receiver's time base. AVR
+#frames without a timestamp are stamped with our clock when they arrive.
+
+import math
+import socket
+import threading
+import time
+import air_modes
+from air_modes import wire
+from air_modes.sbs1 import dumb_task_runner
+from air_modes.parse import subscribe_dl
+
+BEAST_CLOCK = 12000000
+_TICK_MASK = (1 << 48) - 1
+_beast_types = {2: ord('1'), 7: ord('2'), 14: ord('3')}
+_beast_lengths = {ord('1'): 2, ord('2'): 7, ord('3'): 14}
+
+def _ticks(secs, frac):
+    return (secs * BEAST_CLOCK + int(round(frac * BEAST_CLOCK))) & _TICK_MASK
+
+def _stamp(ticks):
+    return ticks // BEAST_CLOCK, (ticks % BEAST_CLOCK) / float(BEAST_CLOCK)
+
+#the signal byte is amplitude relative to full scale, 255 at 0dB
+def _signal(rssi):
+    return max(0, min(255, int(round(255 * 10 ** (rssi / 20.0)))))
+
+def _rssi(signal):
+    return 20.0 * math.log10(max(1, signal) / 255.0)
+
+def beast_encode(message):
+    """Beast frame for a dl_data message in either format."""
+    frame, ecc, rssi, secs, frac, station = wire.decode_message(message)
+    body = _ticks(secs, frac).to_bytes(6, "big") + bytes([_signal(rssi)]) + frame
+    return bytes([0x1a, _beast_types[len(frame)]]) + body.replace(b"\x1a", b"\x1a\x1a")
+
+def avr_encode(message):
+    """AVR line for a dl_data message in either format."""
+    frame = wire.decode_message(message)[0]
+    return ("*%s;\n" % frame.hex().upper()).encode("ascii")
+
+#stream decoders. feed() takes whatever the socket gave us and returns
+#(frame bytes, rssi, secs, frac) for each complete frame, keeping any
+#partial one for next time.
+class beast_decoder:
+    def __init__(self):
+        self._buf = bytearray()
+        self.skipped = 0 #Mode A/C and garbage between frames
+
+    def feed(self, data):
+        self._buf += data
+        buf = self._buf
+        frames = []
+        pos = 0
+        while True:
+            start = buf.find(b"\x1a", pos)
+            if start < 0:
+                pos = len(buf)
+                break
+            if start + 1 >= len(buf):
+                pos = start
+                break
+            if buf[start+1] not in _beast_lengths:
+                #escaped data or noise; resynchronise on the next 0x1a
+                pos = start + 1
+                continue
+            need = 7 + _beast_lengths[buf[start+1]]
+            body = bytearray()
+            i = start + 2
+            while len(body) < need and i < len(buf):
+                if buf[i] == 0x1a:
+                    if i + 1 >= len(buf):
+                        break
+                    if buf[i+1] != 0x1a:
+                        break #an unescaped 0x1a starts the next frame
+                    i += 1
+                body.append(buf[i])
+                i += 1
+            if len(body) < need:
+                if i + 1 >= len(buf):
+                    pos = start #ran out of data, wait for the rest
+                    break
+                self.skipped += 1
+                pos = i
+                continue
+            pos = i
+            if buf[start+1] == ord('1'):
+                self.skipped += 1
+                continue
+            secs, frac = _stamp(int.from_bytes(body[0:6], "big"))
+            frames.append((bytes(body[7:]), _rssi(body[6]), secs, frac))
+        del buf[:pos]
+        return frames
+
+class avr_decoder:
+    def __init__(self):
+        self._buf = b""
+        self.skipped = 0
+
+    def feed(self, data):
+        lines = (self._buf + data).split(b"\n")
+        self._buf = lines.pop()
+        frames = []
+        for line in lines:
+            line = line.strip().rstrip(b";")
+            try:
+                if line[:1] == b"*":
+                    frame = bytes.fromhex(line[1:].decode("ascii"))
+                    now = time.time()
+                    secs, frac = int(now), now - int(now)
+                elif line[:1] == b"@":
+                    secs, frac = _stamp(int(line[1:13], 16))
+                    frame = bytes.fromhex(line[13:].decode("ascii"))
+                else:
+                    raise ValueError
+            except ValueError:
+                self.skipped += 1
+                continue
+            if len(frame) not in (7, 14):
+                self.skipped += 1
+                continue
+            frames.append((frame, 0.0, secs, frac))
+        return frames
+
+#TCP server for one of the formats above, fed from the relay's dl_data.
+#clients that can't keep up are disconnected rather than allowed to stall
+#the relay.
+class output_frames:
+    def __init__(self, port, relay, encode):
+        self._encode = encode
+        self._s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._s.bind(('', port))
+        self._s.listen(1)
+        self._s.setblocking(0) #nonblocking
+        self._conns = [] #list of active connections
+        self._lock = threading.Lock()
+
+        subscribe_dl(relay, self.output)
+        #spawn thread to add new connections as they come in
+        self._runner = dumb_task_runner(self.add_pending_conns, 0.1)
+
+    def output(self, msg):
+        if not self._conns:
+            return
+        try:
+            out = self._encode(msg)
+        except (ValueError, KeyError):
+            return
+        with self._lock:
+            for conn in self._conns[:]: #iterate over a copy of the list
+                try:
+                    conn.sendall(out)
+                except socket.error:
+                    self._conns.remove(conn)
+                    conn.close()
+                    print("Connections: ", len(self._conns))
+
+    def add_pending_conns(self):
+        try:
+            conn, addr = self._s.accept()
+            conn.setblocking(0)
+            with self._lock:
+                self._conns.append(conn)
+            print("Connections: ", len(self._conns))
+        except socket.error:
+            pass
+
+    def close(self):
+        self._runner.close()
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._s.close()
+
+class output_beast(output_frames):
+    def __init__(self, port, relay):
+        output_frames.__init__(self, port, relay, beast_encode)
+
+class output_avr(output_frames):
+    def __init__(self, port, relay):
+        output_frames.__init__(self, port, relay, avr_encode)
+
+#connects to a remote receiver and publishes its frames on pubaddr as
+#dl_data wire records from the given station. reconnects if the link drops.
+class input_frames(threading.Thread):
+    def __init__(self, context, addr, pubaddr, decoder, station=0, retry=5):
+        threading.Thread.__init__(self)
+        host, port = addr.rsplit(":", 1)
+        self._addr = (host, int(port))
+        self._decoder = decoder
+        self._station = station
+        self._retry = retry
+        self._sender = air_modes.zmq_pubsub_iface(context, subaddr=None, pubaddr=pubaddr,
+                                                  name="input %s" % addr)
+        self.received = 0
+        self.shutdown = threading.Event()
+        self.finished = threading.Event()
+        self.setDaemon(True)
+        self.start()
+
+    def run(self):
+        while not self.shutdown.is_set():
+            try:
+                conn = socket.create_connection(self._addr, timeout=self._retry)
+            except socket.error as err:
+                print("Input %s:%i: %s" % (self._addr + (err,)))
+                self.shutdown.wait(self._retry)
+                continue
+            conn.settimeout(0.5)
+            try:
+                while not self.shutdown.is_set():
+                    try:
+                        data = conn.recv(65536)
+                    except socket.timeout:
+                        continue
+                    if not data:
+                        break
+                    for frame, rssi, secs, frac in self._decoder.feed(data):
+                        self.received += 1
+                        self._sender[wire.DL_TOPICS[frame[0] >> 3]] = wire.encode(frame, wire.syndrome(frame), rssi,
+                                                                                  secs, frac, self._station)
+            except socket.error:
+                pass
+            finally:
+                conn.close()
+        self.finished.set()
+
+    def close(self):
+        self.shutdown.set()
+        self.finished.wait(1)
+        self._sender.close()
+
+class input_beast(input_frames):
+    def __init__(self, context, addr, pubaddr, station=0):
+        input_frames.__init__(self, context, addr, pubaddr, beast_decoder(), station)
+
+class input_avr(input_frames):
+    def __init__(self, context, addr, pubaddr, station=0):
+        input_frames.__init__(self, context, addr, pubaddr, avr_decoder(), station)
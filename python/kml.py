@@ -22,37 +22,15 @@
 import sqlite3
 import math, threading, time
 
-class output_kml(threading.Thread):
-    def __init__(self, filename, dbname, localpos, lock, timeout=5):
-        threading.Thread.__init__(self)
+#generates KML from the database. whoever drives it has to open self._db
+#(in the thread it will be used from) and call writekml() periodically.
+class kml_writer:
+    def __init__(self, filename, dbname, localpos, lock):
         self._dbname = dbname
         self._filename = filename
         self.my_coords = localpos
-        self._timeout = timeout
         self._lock = lock
-
-        self.shutdown = threading.Event()
-        self.finished = threading.Event()
-        self.setDaemon(1)
-        self.start()
-
-    def run(self):
-        self._db = sqlite3.connect(self._dbname) #read from the db
-        while self.shutdown.is_set() is False:
-            time.sleep(self._timeout)
-            self.writekml()
-
-        self._db.close()
         self._db = None
-        self.finished.set()
-
-    def close(self):
-        self.shutdown.set()
-        self.finished.wait(0.2)
-        #there's a bug here where self._timeout is long and close() has
-        #to wait for the sleep to expire before closing. we just bail
-        #instead with the 0.2 param above.
-
 
     def writekml(self):
         kmlstr = self.genkml()
@@ -171,8 +149,36 @@ class output_kml(threading.Thread):
         retstr+= '\n\t</Folder>\n</Document>\n</kml>'
         return retstr
 
-#we just inherit from output_kml because we're doing the same thing, only in a different format.
-class output_jsonp(output_kml):
+class output_kml(kml_writer, threading.Thread):
+    def __init__(self, filename, dbname, localpos, lock, timeout=5):
+        threading.Thread.__init__(self)
+        kml_writer.__init__(self, filename, dbname, localpos, lock)
+        self._timeout = timeout
+
+        self.shutdown = threading.Event()
+        self.finished = threading.Event()
+        self.setDaemon(1)
+        self.start()
+
+    def run(self):
+        self._db = sqlite3.connect(self._dbname) #read from the db
+        while self.shutdown.is_set() is False:
+            time.sleep(self._timeout)
+            self.writekml()
+
+        self._db.close()
+        self._db = None
+        self.finished.set()
+
+    def close(self):
+        self.shutdown.set()
+        self.finished.wait(0.2)
+        #there's a bug here where self._timeout is long and close() has
+        #to wait for the sleep to expire before closing. we just bail
+        #instead with the 0.2 param above.
+
+#we just inherit from kml_writer because we're doing the same thing, only in a different format.
+class jsonp_writer(kml_writer):
     def set_highlight(self, icao):
         self.highlight = icao
 
@@ -246,3 +252,6 @@ class output_jsonp(output_kml):
 
         retstr+= """]);"""
         return retstr
+
+class output_jsonp(jsonp_writer, output_kml):
+    pass
@@ -100,7 +100,11 @@ class stamp:
         return "%f" % float(self)
 
 #a Mode S report including the modes_reply data object
-modes_report = namedtuple('modes_report', ['data', 'ecc', 'rssi', 'timestamp'])
+#stations is None for a report from a single receiver, or when aggregated
+#from several, a list of (station id, rssi) pairs for every station which
+#heard the frame.
+modes_report = namedtuple('modes_report', ['data', 'ecc', 'rssi', 'timestamp', 'stations'],
+                          defaults=(None,))
 #lat, lon, alt
 #TODO: a position class internally represented as ECEF XYZ which can easily be used for multilateration and distance calculation
 llh = namedtuple('llh', ['lat', 'lon', 'alt'])
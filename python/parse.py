@@ -23,6 +23,7 @@ import time, os, sys
 from air_modes.altitude import decode_alt
 import math
 import air_modes
+from air_modes import wire
 from air_modes.exceptions import *
 
 #this implements a packet class which can retrieve its own fields.
@@ -418,19 +419,59 @@ def parse_TCAS_CRM(data):
   (resolutions, complements) = parseMB_TCAS_resolutions(data)
   return (resolutions, complements, data["rat"], data["mte"])
 
-#this decorator takes a pubsub and returns a function which parses and publishes messages
+_type_topics = tuple("type%i_dl" % df for df in range(32))
+
+#publish a single report given the raw frame fields
+def publish_report(pub, data, ecc, reference, int_timestamp, frac_timestamp):
+  publish_rssi_report(pub, data, ecc, 10.0*math.log10(max(1e-8,reference)),
+                      int_timestamp, frac_timestamp)
+
+#as publish_report, with the level already converted to dB
+def publish_rssi_report(pub, data, ecc, rssi, int_timestamp, frac_timestamp, stations=None):
+  try:
+    ret = air_modes.modes_report(modes_reply(data),
+                                 ecc,
+                                 rssi,
+                                 air_modes.stamp(int_timestamp, frac_timestamp),
+                                 stations)
+    pub["modes_dl"] = ret
+    pub[_type_topics[ret.data.get_type()]] = ret
+  except ADSBError:
+    pass
+
+#this decorator takes a pubsub and returns a function which parses and publishes messages.
+#messages can be either binary wire records or the slicer's ASCII lines.
 def make_parser(pub):
   publisher = pub
   def publish(message):
+    if wire.is_wire(message):
+      try:
+        frame, ecc, rssi, secs, frac, station = wire.decode(message)
+      except ValueError:
+        return
+      publish_rssi_report(pub, int.from_bytes(frame, 'big'), ecc, rssi, secs, frac)
+      return
     [data, ecc, reference, int_timestamp, frac_timestamp] = message.split()
-    try:
-      ret = air_modes.modes_report(modes_reply(int(data, 16)),
-                                   int(ecc, 16),
-                                   10.0*math.log10(max(1e-8,float(reference))),
-                                   air_modes.stamp(int(int_timestamp), float(frac_timestamp)))
-      pub["modes_dl"] = ret
-      pub["type%i_dl" % ret.data.get_type()] = ret
-    except ADSBError:
-      pass
+    publish_report(pub, int(data, 16), int(ecc, 16), float(reference),
+                   int(int_timestamp), float(frac_timestamp))
 
   return publish
+
+#subscribe to frames from the downlink formats in dfs only, or from all of
+#them if dfs is None. ZMQ filters the per-DF topics; frames under plain
+#dl_data, from ASCII or older feeders, are filtered here after decoding.
+def subscribe_dl(relay, subscriber, dfs=None):
+  if dfs is None:
+    relay.subscribe(wire.DL_PREFIX, subscriber)
+    relay.subscribe(wire.DL_LEGACY, subscriber)
+    return
+  dfs = frozenset(dfs)
+  for df in sorted(dfs):
+    relay.subscribe(wire.DL_TOPICS[df], subscriber)
+  def legacy(message):
+    try:
+      if wire.df(message) in dfs:
+        subscriber(message)
+    except ValueError:
+      pass
+  relay.subscribe(wire.DL_LEGACY, legacy)
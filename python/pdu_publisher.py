@@ -0,0 +1,181 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#blocks which take the slicer's frame PDUs from rx_path's "frames" port
+#and publish them, building each wire record straight from the PDU so no
+#text is formatted and reparsed on the way.
+#
+#pdu_iface_sink hands the records to a zmq_pubsub_iface, whose queue and
+#thread do the sending; that's modes_radio's default, so the queue limit
+#and drop policy apply. pdu_publisher sends them itself on the scheduler's
+#thread, so nothing changes hands in between.
+#
+#the framing is zmq_pubsub_iface's, so subscribers can't tell the
+#difference: frames go out under wire.DL_TOPICS (plain dl_data for ASCII
+#lines), batch_size at a time, optionally compressed. a partial batch goes
+#out when a frame arrives after it has waited batch_latency seconds, or
+#when anything arrives on the "flush" port; connect a blocks.message_strobe
+#to that so a quiet spell doesn't hold frames back. with the strobe at
+#half batch_latency, no batch waits more than about 1.5 times
+#batch_latency. the socket has no queue of its own beyond the ZMQ
+#high-water mark, so when a subscriber can't keep up ZMQ drops.
+
+import time
+import pmt
+import zmq
+from gnuradio import gr
+from air_modes import wire
+from air_modes.zmq_socket import pack_batch, COMPRESSION_MARKERS
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_syndrome = pmt.intern("syndrome")
+_reference = pmt.intern("reference_level")
+_timestamp = pmt.intern("timestamp")
+
+#base for both: turns each PDU into a (topic, record) pair for publish()
+class pdu_sink(gr.basic_block):
+    def __init__(self, name, station=0, wire_format="binary"):
+        gr.basic_block.__init__(self, name=name, in_sig=None, out_sig=None)
+        self._station = station
+        self._binary = (wire_format == "binary")
+        self._sent = 0
+        self.message_port_register_in(pmt.intern("frames"))
+        self.set_msg_handler(pmt.intern("frames"), self.handle_frame)
+
+    def _record(self, meta, data):
+        ecc = pmt.to_long(pmt.dict_ref(meta, _syndrome, pmt.PMT_NIL))
+        reference = pmt.to_double(pmt.dict_ref(meta, _reference, pmt.PMT_NIL))
+        tstamp = pmt.dict_ref(meta, _timestamp, pmt.PMT_NIL)
+        secs = pmt.to_uint64(pmt.tuple_ref(tstamp, 0))
+        frac = pmt.to_double(pmt.tuple_ref(tstamp, 1))
+        if self._binary:
+            return wire.encode(data, ecc, wire.rssi(reference), secs, frac, self._station)
+        return ("%s %06x %g %i %.10g" % (data.hex(), ecc, reference, secs, frac)).encode('ascii')
+
+    def handle_frame(self, pdu):
+        data = bytes(pmt.u8vector_elements(pmt.cdr(pdu)))
+        record = self._record(pmt.car(pdu), data)
+        #older receivers only know plain dl_data
+        topic = wire.DL_TOPICS[data[0] >> 3] if self._binary else wire.DL_LEGACY
+        self._sent += 1
+        self.publish(topic, record)
+
+    def publish(self, topic, record):
+        raise NotImplementedError
+
+    def get_num_sent(self):
+        return self._sent
+
+class pdu_iface_sink(pdu_sink):
+    def __init__(self, sender, station=0, wire_format="binary"):
+        pdu_sink.__init__(self, "pdu_iface_sink", station, wire_format)
+        self._sender = sender
+
+    def publish(self, topic, record):
+        self._sender[topic] = record
+
+class pdu_publisher(pdu_sink):
+    def __init__(self, context, pubaddr, station=0, wire_format="binary", batch_size=1,
+                 batch_latency=0, sndhwm=None, compression=None, compression_level=6):
+        pdu_sink.__init__(self, "pdu_publisher", station, wire_format)
+        if compression is not None and compression not in COMPRESSION_MARKERS:
+            raise ValueError("compression must be one of %s" % ", ".join(COMPRESSION_MARKERS))
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard module")
+        self._batch_size = max(1, batch_size)
+        self._batch_latency = batch_latency
+        self._compression = compression
+        self._compression_level = compression_level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=compression_level) if compression == "zstd" else None
+        self._pending = {}
+        self._pending_since = None
+        self._batches = 0
+        self._raw_bytes = 0
+        self._compressed_bytes = 0
+        self._compress_time = 0.0
+
+        #the socket is only ever used from the message handlers, which the
+        #scheduler runs on one thread, or by close() once it has stopped
+        self._socket = context.socket(zmq.PUB)
+        if sndhwm is not None:
+            self._socket.setsockopt(zmq.SNDHWM, sndhwm)
+        if type(pubaddr) is str:
+            pubaddr = [pubaddr]
+        for addr in pubaddr:
+            self._socket.bind(addr.encode('ascii'))
+
+        self.message_port_register_in(pmt.intern("flush"))
+        self.set_msg_handler(pmt.intern("flush"), self.handle_flush)
+
+    def _send(self, key, batch):
+        start = time.thread_time()
+        parts, raw_len = pack_batch(batch, self._compression, self._compression_level, self._zstd_compressor)
+        if self._compression is not None:
+            self._compress_time += time.thread_time() - start
+            self._raw_bytes += raw_len
+            self._compressed_bytes += len(parts[1])
+        self._socket.send_multipart([key] + parts)
+        self._batches += 1
+
+    def _flush(self):
+        for key, batch in self._pending.items():
+            self._send(key, batch)
+        self._pending = {}
+        self._pending_since = None
+
+    def publish(self, topic, record):
+        key = topic.encode('ascii')
+        if self._batch_size == 1:
+            self._send(key, [record])
+            return
+        now = time.time()
+        batch = self._pending.setdefault(key, [])
+        batch.append(record)
+        if self._pending_since is None:
+            self._pending_since = now
+        if len(batch) >= self._batch_size:
+            self._send(key, batch)
+            del self._pending[key]
+            if not self._pending:
+                self._pending_since = None
+        if self._pending_since is not None and now >= self._pending_since + self._batch_latency:
+            self._flush()
+
+    def handle_flush(self, msg):
+        if self._pending_since is not None and time.time() >= self._pending_since + self._batch_latency:
+            self._flush()
+
+    def get_stats(self):
+        return {"sent": self._sent,
+                "batches": self._batches,
+                "raw_bytes": self._raw_bytes,
+                "compressed_bytes": self._compressed_bytes,
+                "compression_ratio": float(self._raw_bytes) / self._compressed_bytes if self._compressed_bytes else 1.0,
+                "compress_time": self._compress_time}
+
+    #call once the flowgraph has stopped
+    def close(self):
+        if self._pending:
+            self._flush()
+        self._socket.close()
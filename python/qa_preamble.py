@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr, gr_unittest, blocks
+import pmt
+import air_modes_swig as air_modes
+
+RATE = 2e6 #one sample per chip
+PULSE = 100.0
+NOISE = 1.0
+
+#a long frame of all zero bits at sample start, i.e. the preamble's
+#pulses on chips 0, 2, 7 and 9, then a pulse on every odd chip after it
+def long_frame(samples, start):
+    for chip in (0, 2, 7, 9):
+        samples[start+chip] = PULSE
+    for chip in range(17, 240, 2):
+        samples[start+chip] = PULSE
+
+class qa_preamble(gr_unittest.TestCase):
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def run_preamble(self, samples):
+        src = blocks.vector_source_f(samples, False)
+        avg = blocks.vector_source_f([NOISE]*len(samples), False)
+        self.sync = air_modes.preamble(RATE, 7)
+        sink = blocks.vector_sink_f()
+        self.tb.connect(src, (self.sync, 0))
+        self.tb.connect(avg, (self.sync, 1))
+        self.tb.connect(self.sync, sink)
+        self.tb.run()
+        return sink.data()
+
+    def stat(self, key):
+        return pmt.to_uint64(pmt.dict_ref(self.sync.get_stats(), pmt.intern(key), pmt.PMT_NIL))
+
+    def test_001_overlapping_preamble_suppressed(self):
+        samples = [NOISE]*4000
+        long_frame(samples, 100)
+        #a second preamble 57 chips into the first frame: its pulses on
+        #chips 0 and 2 land on the frame's own, so only 7 and 9 are needed
+        samples[100+57+7] = PULSE
+        samples[100+57+9] = PULSE
+
+        out = self.run_preamble(samples)
+        self.assertEqual(len(out), 240)
+        self.assertEqual(self.stat("accepted"), 1)
+        self.assertGreater(self.sync.get_num_suppressed(), 0)
+        self.assertEqual(self.stat("suppressed"), self.sync.get_num_suppressed())
+
+    def test_002_separate_frames_not_suppressed(self):
+        samples = [NOISE]*4000
+        long_frame(samples, 100)
+        long_frame(samples, 100+300)
+
+        out = self.run_preamble(samples)
+        self.assertEqual(len(out), 480)
+        self.assertEqual(self.stat("accepted"), 2)
+        self.assertEqual(self.sync.get_num_suppressed(), 0)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_preamble)
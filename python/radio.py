@@ -23,16 +23,18 @@
 # You pass it options, it gives you data.
 # It uses the pubsub interface to allow clients to subscribe to its data feeds.
 
-from gnuradio import gr, gru, eng_notation, filter, blocks
+from gnuradio import gr, eng_notation, filter, blocks
 from gnuradio.filter import optfir
 from gnuradio.eng_option import eng_option
 from gnuradio.gr.pubsub import pubsub
 from gnuradio.filter import pfb
 from optparse import OptionParser, OptionGroup
 import air_modes
+import pmt
 import zmq
 import threading
 import time
+import os
 import re
 
 class modes_radio (gr.top_block, pubsub):
@@ -40,20 +42,29 @@ class modes_radio (gr.top_block, pubsub):
     gr.top_block.__init__(self)
     pubsub.__init__(self)
     self._options = options
-    self._queue = gr.msg_queue()
     self._rate = int(options.rate)
+    self._start_time = None
 
     self._resample = None
     self._setup_source(options)
 
-    if self._rate < 4e6:
+    #the demodulator runs natively at any rate of 2Msps or more; below that
+    #we have to resample up to a rate it can handle
+    if self._rate < 2e6:
+        if self._iq_format != "fc32":
+            raise NotImplementedError("%s input below 2Msps not currently supported." % self._iq_format)
         self._resample = pfb.arb_resampler_ccf(4.e6/self._rate)
         self._rx_rate = 4e6
     else:
         self._rx_rate = self._rate
 
     self._rx_path = air_modes.rx_path(self._rx_rate, options.threshold,
-                                      self._queue, options.pmf, options.dcblock)
+                                      None, options.pmf, options.dcblock,
+                                      options.fused, self._iq_format)
+    self._rx_path.set_max_correction(options.correct)
+    self._rx_path.set_icao_timeout(options.icao_timeout)
+    self._rx_path.set_holdoff(options.holdoff)
+    self._rx_path.set_stronger_wins(options.stronger_wins)
 
 
     #now subscribe to set various options via pubsub
@@ -75,16 +86,44 @@ class modes_radio (gr.top_block, pubsub):
     else:
         self.connect(self._u, self._rx_path)
 
-    #Publish messages when they come back off the queue
+    #Publish frames from the slicer's PDUs; without a queue it doesn't
+    #format them as text as well
     server_addr = ["inproc://modes-radio-pub"]
     if options.tcp is not None:
         server_addr += ["tcp://*:%i" % options.tcp]
 
-    self._sender = air_modes.zmq_pubsub_iface(context, subaddr=None, pubaddr=server_addr)
-    self._async_sender = gru.msgq_runner(self._queue, self.send)
-
-  def send(self, msg):
-    self._sender["dl_data"] = msg.to_string()
+    if options.direct:
+      #from the slicer's message port to the socket on the scheduler's thread
+      self._sender = air_modes.pdu_publisher(context, server_addr,
+                                             station=options.station_id,
+                                             wire_format=options.wire_format,
+                                             batch_size=options.batch_size,
+                                             batch_latency=options.batch_latency*1e-3,
+                                             sndhwm=options.hwm,
+                                             compression=options.compress,
+                                             compression_level=options.compress_level)
+      self._frames = self._sender
+      if options.batch_size > 1:
+        self._flush_strobe = blocks.message_strobe(pmt.PMT_T, int(max(1, options.batch_latency / 2.0)))
+        self.msg_connect(self._flush_strobe, "strobe", self._sender, "flush")
+    else:
+      self._sender = air_modes.zmq_pubsub_iface(context, subaddr=None, pubaddr=server_addr,
+                                                batch_size=options.batch_size,
+                                                batch_latency=options.batch_latency*1e-3,
+                                                queue_limit=options.queue_limit,
+                                                drop_policy=options.drop_policy,
+                                                sndhwm=options.hwm,
+                                                stats_interval=options.stats_interval,
+                                                name="radio publisher",
+                                                compression=options.compress,
+                                                compression_level=options.compress_level)
+      #hands records to the publisher's queue and thread
+      self._frames = air_modes.pdu_iface_sink(self._sender, options.station_id, options.wire_format)
+    self.msg_connect(self._rx_path, "frames", self._frames, "frames")
+
+  def start(self, *args, **kwargs):
+    self._start_time = time.time()
+    gr.top_block.start(self, *args, **kwargs)
 
   @staticmethod
   def add_radio_options(parser):
@@ -92,9 +131,42 @@ class modes_radio (gr.top_block, pubsub):
 
     #Choose source
     group.add_option("-s","--source", type="string", default="uhd",
-                      help="Choose source: uhd, osmocom, <filename>, or <ip:port> [default=%default]")
+                      help="Choose source: uhd, osmocom, <filename>, or <ip:port>, optionally prefixed with an IQ format fc32:, sc16: or uc8: [default=%default]")
+    group.add_option("--replay", action="store_true", default=False,
+                      help="Memory-map the source file and replay it, printing throughput at exit [default=%default]")
+    group.add_option("--replay-start", type="eng_float", default=0, metavar="SECONDS",
+                      help="Start replay this far into the file [default=%default]")
+    group.add_option("--replay-stop", type="eng_float", default=0, metavar="SECONDS",
+                      help="Stop replay this far into the file, 0 for end of file [default=%default]")
+    group.add_option("--replay-speed", type="eng_float", default=0, metavar="FACTOR",
+                      help="Replay at this multiple of real time, 0 for as fast as possible [default=%default]")
+    group.add_option("--capture-time", type="eng_float", default=None, metavar="EPOCH",
+                      help="UNIX time of the first sample in the file [default=file mtime less its duration]")
     group.add_option("-t","--tcp", type="int", default=None, metavar="PORT",
                       help="Open a TCP server on this port to publish reports")
+    group.add_option("--wire-format", type="choice", choices=["binary", "ascii"], default="binary",
+                      help="Publish reports as binary records, or as ASCII lines for older clients [default=%default]")
+    group.add_option("--station-id", type="int", default=0, metavar="ID",
+                      help="Identify this receiver in binary reports [default=%default]")
+    group.add_option("--queue-limit", type="int", default=10000, metavar="N",
+                      help="Hold at most this many reports waiting to be published, 0 for no limit [default=%default]")
+    group.add_option("--drop-policy", type="choice", choices=["drop-oldest", "drop-newest", "block"],
+                      default="drop-oldest",
+                      help="What to do with reports when the queue is full: drop-oldest, drop-newest or block [default=%default]")
+    group.add_option("--hwm", type="int", default=None, metavar="N",
+                      help="ZMQ send high-water mark for the report publisher [default=ZMQ default]")
+    group.add_option("--stats-interval", type="eng_float", default=0, metavar="SECONDS",
+                      help="Print publisher queue counters this often, 0 to disable [default=%default]")
+    group.add_option("--compress", type="choice", choices=["zlib", "zstd"], default=None,
+                      help="Compress each batch of published reports with zlib or zstd [default=off]")
+    group.add_option("--compress-level", type="int", default=6, metavar="LEVEL",
+                      help="Compression level for --compress [default=%default]")
+    group.add_option("--direct", action="store_true", default=False,
+                      help="Publish frames on the flowgraph's thread, skipping the publisher's queue and thread; --queue-limit, --drop-policy and --stats-interval don't apply [default=%default]")
+    group.add_option("--batch-size", type="int", default=1, metavar="N",
+                      help="Publish up to this many reports per ZMQ message [default=%default]")
+    group.add_option("--batch-latency", type="eng_float", default=10, metavar="MS",
+                      help="Hold a partial batch of reports no longer than this [default=%default]")
 
     #UHD/Osmocom args
     group.add_option("-R", "--subdev", type="string",
@@ -117,6 +189,16 @@ class modes_radio (gr.top_block, pubsub):
                       help="Use pulse matched filtering [default=%default]")
     group.add_option("-d","--dcblock", action="store_true", default=False,
                       help="Use a DC blocking filter (best for HackRF Jawbreaker) [default=%default]")
+    group.add_option("-F","--fused", action="store_true", default=False,
+                      help="Compute magnitude, pulse matched filter and noise floor in a single block [default=%default]")
+    group.add_option("-e","--correct", type="int", default=1, metavar="BITS",
+                      help="Correct up to this many low-confidence bit errors in DF11/DF17 frames (0-2) [default=%default]")
+    group.add_option("--holdoff", type="eng_float", default=120, metavar="US",
+                      help="Ignore preambles within this many microseconds of an accepted one [default=%default]")
+    group.add_option("--stronger-wins", action="store_true", default=False,
+                      help="Accept a preamble inside the holdoff window if it is stronger than the last by the threshold [default=%default]")
+    group.add_option("--icao-timeout", type="eng_float", default=60, metavar="SECONDS",
+                      help="Drop Address/Parity frames from aircraft not heard in a clean DF11/DF17 for this long, 0 to disable [default=%default]")
 
     parser.add_option_group(group)
 
@@ -133,9 +215,9 @@ class modes_radio (gr.top_block, pubsub):
     return self.get_gain()
 
   def set_rate(self, rate):
-    if(rate < 4e6 and self._rate > 4e6):
-        raise NotImplementedError("Lowering rate <4e6Msps not currently supported.")
-    if(rate < 4e6):
+    if(rate < 2e6 and self._resample is None):
+        raise NotImplementedError("Lowering rate <2Msps not currently supported.")
+    if(self._resample is not None):
         self._resample.set_rate(4e6/rate)
         self._rx_rate = 4e6
     else:
@@ -157,17 +239,32 @@ class modes_radio (gr.top_block, pubsub):
   def get_gain(self):
     return self._u.get_gain() if self.live_source() else 0
 
+  #decoder and publisher counters, as nested dicts
+  def get_stats(self):
+    stats = self._rx_path.get_stats()
+    stats["publisher"] = self._sender.get_stats()
+    return stats
+
   def get_rate(self):
     return self._u.get_rate() if self.live_source() else self._rate
 
   def _setup_source(self, options):
+    #strip off an IQ format qualifier, e.g. uc8:capture.bin for rtl_sdr output
+    self._iq_format = "fc32"
+    fmt = re.match("(fc32|sc16|uc8):(.*)", options.source)
+    if fmt is not None:
+      self._iq_format, options.source = fmt.groups()
+    itemsize = air_modes.iq_itemsize[self._iq_format]
+
     if options.source == "uhd":
       #UHD source by default
       from gnuradio import uhd
+      if self._iq_format == "uc8":
+        raise NotImplementedError("UHD can't supply uc8 samples, use sc16 or fc32.")
       self._u = uhd.usrp_source(
           options.args,
           uhd.stream_args(
-              cpu_format="fc32",
+              cpu_format=self._iq_format,
               channels=range(1),
           ),
       )
@@ -202,6 +299,8 @@ class modes_radio (gr.top_block, pubsub):
     #and set up accordingly.
     elif options.source == "osmocom": #RTLSDR dongle or HackRF Jawbreaker
         import osmosdr
+        if self._iq_format != "fc32":
+            raise NotImplementedError("osmocom sources only supply fc32 samples.")
         self._u = osmosdr.source(options.args)
 #        self._u.set_sample_rate(3.2e6) #fixed for RTL dongles
         self._u.set_sample_rate(options.rate)
@@ -225,16 +324,38 @@ class modes_radio (gr.top_block, pubsub):
           ip, port = re.search("(.*)\:(\d{1,5})", options.source).groups()
         except:
           raise Exception("Please input UDP source e.g. 192.168.10.1:12345")
-        self._u = blocks.udp_source(gr.sizeof_gr_complex, ip, int(port))
+        self._u = blocks.udp_source(itemsize, ip, int(port))
         print("Using UDP source %s:%s" % (ip, port))
+      elif options.replay:
+        capture_time = options.capture_time
+        if capture_time is None:
+          #the capture ended when the file was last written
+          st = os.stat(options.source)
+          capture_time = st.st_mtime - float(st.st_size // itemsize) / options.rate
+        self._u = air_modes.replay_source(options.source, itemsize, options.rate, capture_time,
+                                          int(options.replay_start * options.rate),
+                                          int(options.replay_stop * options.rate),
+                                          options.replay_speed)
+        print("Replaying %s (%i samples)" % (options.source, self._u.get_num_items()))
       else:
-        self._u = blocks.file_source(gr.sizeof_gr_complex, options.source)
-        print("Using file source %s" % options.source)
+        self._u = blocks.file_source(itemsize, options.source)
+        print("Using %s file source %s" % (self._iq_format, options.source))
 
     print("Rate is %i" % (options.rate,))
 
   def close(self):
     self.stop()
     self.wait()
+    if self._options.replay and self._start_time is not None:
+      self.print_replay_summary()
     self._sender.close()
     self._u = None
+
+  def print_replay_summary(self):
+    elapsed = time.time() - self._start_time
+    nsamples = self._u.nitems_written(0)
+    nframes = self._frames.get_num_sent()
+    print("Replayed %i samples and %i frames in %.3fs" % (nsamples, nframes, elapsed))
+    print("Samples/sec:       %.3fM" % (nsamples / elapsed / 1e6))
+    print("Frames/sec:        %.0f" % (nframes / elapsed))
+    print("Real-time factor:  %.2fx" % (nsamples / float(self._rate) / elapsed))
@@ -21,55 +21,100 @@
 
 from gnuradio import gr, blocks, filter
 import air_modes
+import pmt
+
+#bytes per IQ sample for each input format the demodulator understands
+iq_itemsize = {"fc32": gr.sizeof_gr_complex,
+               "sc16": 2*gr.sizeof_short,
+               "uc8":  2*gr.sizeof_char}
 
 class rx_path(gr.hier_block2):
 
-    def __init__(self, rate, threshold, queue, use_pmf=False, use_dcblock=False):
+    def __init__(self, rate, threshold, queue, use_pmf=False, use_dcblock=False, use_fused=False, iq_format="fc32"):
+        if iq_format not in iq_itemsize:
+            raise ValueError("Unknown IQ format %s" % iq_format)
+        #integer samples go straight into the fused demodulator, which
+        #computes magnitude without converting to complex float first
+        if iq_format != "fc32":
+            if use_dcblock:
+                raise ValueError("DC blocking needs fc32 input")
+            use_fused = True
+
         gr.hier_block2.__init__(self, "modes_rx_path",
-                                gr.io_signature(1, 1, gr.sizeof_gr_complex),
+                                gr.io_signature(1, 1, iq_itemsize[iq_format]),
                                 gr.io_signature(0,0,0))
 
         self._rate = int(rate)
         self._threshold = threshold
         self._queue = queue
-        self._spc = int(rate/2e6)
+        self._spc = rate/2e6
 
-        # Convert incoming I/Q baseband to amplitude
-        self._demod = blocks.complex_to_mag_squared()
         if use_dcblock:
-            self._dcblock = filter.dc_blocker_cc(100*self._spc,False)
-            self.connect(self, self._dcblock, self._demod)
+            self._dcblock = filter.dc_blocker_cc(int(round(100*self._spc)),False)
+            self.connect(self, self._dcblock)
+            self._iq = self._dcblock
         else:
-            self.connect(self, self._demod)
             self._dcblock = None
-
-        self._bb = self._demod
-        # Pulse matched filter for 0.5us pulses
-        if use_pmf:
-            self._pmf = blocks.moving_average_ff(self._spc, 1.0/self._spc)#, self._rate)
-            self.connect(self._demod, self._pmf)
-            self._bb = self._pmf
-
-        # Establish baseline amplitude (noise, interference)
-        self._avg = blocks.moving_average_ff(48*self._spc, 1.0/(48*self._spc))#, self._rate) # 3 preambles
+            self._iq = self
 
         # Synchronize to Mode-S preamble
         self._sync = air_modes.preamble(self._rate, self._threshold)
 
+        if use_fused:
+            # Magnitude, pulse matched filter and noise average in one pass
+            self._fused = air_modes.demod(self._rate, use_pmf, iq_format)
+            self.connect(self._iq, self._fused)
+            self.connect((self._fused, 0), (self._sync, 0))
+            self.connect((self._fused, 1), (self._sync, 1))
+        else:
+            self._fused = None
+
+            # Convert incoming I/Q baseband to amplitude
+            self._demod = blocks.complex_to_mag_squared()
+            self.connect(self._iq, self._demod)
+
+            self._bb = self._demod
+            # Pulse matched filter for 0.5us pulses
+            if use_pmf:
+                pmflen = self._pmf_length()
+                self._pmf = blocks.moving_average_ff(pmflen, 1.0/pmflen)#, self._rate)
+                self.connect(self._demod, self._pmf)
+                self._bb = self._pmf
+
+            # Establish baseline amplitude (noise, interference)
+            avglen = self._avg_length()
+            self._avg = blocks.moving_average_ff(avglen, 1.0/avglen)#, self._rate) # 3 preambles
+
+            self.connect(self._bb, (self._sync, 0))
+            self.connect(self._bb, self._avg, (self._sync, 1))
+
         # Slice Mode-S bits and send to message queue
         self._slicer = air_modes.slicer(self._queue)
-
-        # Wire up the flowgraph
-        self.connect(self._bb, (self._sync, 0))
-        self.connect(self._bb, self._avg, (self._sync, 1))
         self.connect(self._sync, self._slicer)
 
+        # Binary frame PDUs, for consumers which don't want the queue's text
+        self.message_port_register_hier_out("frames")
+        self.msg_connect(self._slicer, "frames", self, "frames")
+
+    #samples per chip can be fractional (e.g. 1.2 at 2.4Msps), so filter
+    #lengths are rounded to the nearest whole sample
+    def _pmf_length(self):
+        return max(1, int(round(self._spc)))
+
+    def _avg_length(self):
+        return max(1, int(round(48*self._spc)))
+
     def set_rate(self, rate):
         self._sync.set_rate(int(rate))
-        self._spc = int(rate/2e6)
-        self._avg.set_length_and_scale(48*self._spc, 1.0/(48*self._spc))
+        self._spc = rate/2e6
+        if self._fused is not None:
+            self._fused.set_rate(int(rate))
+            return
+        avglen = self._avg_length()
+        self._avg.set_length_and_scale(avglen, 1.0/avglen)
         if self._bb != self._demod:
-            self._pmf.set_length_and_scale(self._spc, 1.0/self._spc)
+            pmflen = self._pmf_length()
+            self._pmf.set_length_and_scale(pmflen, 1.0/pmflen)
 #        if self._dcblock is not None:
 #            self._dcblock.set_length(100*self._spc)
 
@@ -81,8 +126,44 @@ class rx_path(gr.hier_block2):
         pass
 
     def get_pmf(self, pmf):
+        if self._fused is not None:
+            return self._fused.get_pmf()
         return not (self._bb == self._demod)
 
     def get_threshold(self):
         return self._sync.get_threshold()
 
+    def set_holdoff(self, holdoff_us):
+        self._sync.set_holdoff(holdoff_us)
+
+    def get_holdoff(self):
+        return self._sync.get_holdoff()
+
+    def set_stronger_wins(self, stronger_wins):
+        self._sync.set_stronger_wins(stronger_wins)
+
+    def get_num_suppressed(self):
+        return self._sync.get_num_suppressed()
+
+    def set_max_correction(self, bits):
+        self._slicer.set_max_correction(bits)
+
+    def get_max_correction(self):
+        return self._slicer.get_max_correction()
+
+    def get_num_corrected(self):
+        return self._slicer.get_num_corrected()
+
+    def set_icao_timeout(self, seconds):
+        self._slicer.set_icao_timeout(seconds)
+
+    def get_icao_timeout(self):
+        return self._slicer.get_icao_timeout()
+
+    def get_num_filtered(self):
+        return self._slicer.get_num_filtered()
+
+    #counters from the preamble detector and slicer, as nested dicts
+    def get_stats(self):
+        return {"preamble": pmt.to_python(self._sync.get_stats()),
+                "slicer": pmt.to_python(self._slicer.get_stats())}
@@ -46,30 +46,17 @@ class dumb_task_runner(threading.Thread):
         self.shutdown.set()
         self.finished.wait(self._interval)
 
-class output_sbs1:
-  def __init__(self, cprdec, port, pub):
-    self._s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    self._s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    self._s.bind(('', port))
-    self._s.listen(1)
-    self._s.setblocking(0) #nonblocking
-    self._conns = [] #list of active connections
+#message types the SBS-1 format has anything to say about
+SBS1_TYPES = (0, 4, 5, 11, 17)
+
+#turns reports into SBS-1 lines. the socket handling lives in the
+#subclasses, so the same formatting serves threaded and asyncio servers.
+class sbs1_formatter:
+  def __init__(self, cprdec):
     self._aircraft_id_map = {} # dictionary of icao24 to aircraft IDs
     self._aircraft_id_count = 0 # Current Aircraft ID count
-
     self._cpr = cprdec
 
-    #it could be cleaner if there were separate output_* fns
-    #but this works
-    for i in (0, 4, 5, 11, 17):
-        pub.subscribe("type%i_dl" % i, self.output)
-
-    #spawn thread to add new connections as they come in
-    self._runner = dumb_task_runner(self.add_pending_conns, 0.1)
-
-  def __del__(self):
-    self._s.close()
-
   def get_aircraft_id(self, icao24):
     if icao24 in self._aircraft_id_map:
       return self._aircraft_id_map[icao24]
@@ -82,34 +69,13 @@ class output_sbs1:
     # dictionary is getting too large.
     if len(self._aircraft_id_map) > 1e4:
       minimum = min(self._aircraft_id_map.values()) + (len(self._aircraft_id_map) - 1e4)
-      for icao, _id in dict(self._aircraft_id_map).iteritems():
+      for icao, _id in dict(self._aircraft_id_map).items():
         if _id < minimum:
             del self._aircraft_id_map[icao]
 
     # Finally return the new pair
     return self._aircraft_id_count
 
-  def output(self, msg):
-    try:
-      sbs1_msg = self.parse(msg)
-      if sbs1_msg is not None:
-        sbs1_bytes = sbs1_msg.encode('utf-8')
-        for conn in self._conns[:]: #iterate over a copy of the list
-          conn.send(sbs1_bytes)
-    except socket.error:
-      self._conns.remove(conn)
-      print("Connections: ", len(self._conns))
-    except ADSBError:
-      pass
-
-  def add_pending_conns(self):
-    try:
-      conn, addr = self._s.accept()
-      self._conns.append(conn)
-      print("Connections: ", len(self._conns))
-    except socket.error:
-      pass
-
   def current_time(self):
     timenow = datetime.datetime.now()
     return [timenow.strftime("%Y/%m/%d"), timenow.strftime("%H:%M:%S.%f")[0:-3]]
@@ -220,3 +186,45 @@ class output_sbs1:
         retstr = "MSG,4,0,%i,%06X,%i,%s,%s,%s,%s,,,%.1f,%.1f,,,%i,,,,,\r\n" % (aircraft_id, icao24, aircraft_id+100, datestr, timestr, datestr, timestr, velocity, heading, vert_spd)
 
     return retstr
+
+class output_sbs1(sbs1_formatter):
+  def __init__(self, cprdec, port, pub):
+    sbs1_formatter.__init__(self, cprdec)
+    self._s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._s.bind(('', port))
+    self._s.listen(1)
+    self._s.setblocking(0) #nonblocking
+    self._conns = [] #list of active connections
+
+    #it could be cleaner if there were separate output_* fns
+    #but this works
+    for i in SBS1_TYPES:
+        pub.subscribe("type%i_dl" % i, self.output)
+
+    #spawn thread to add new connections as they come in
+    self._runner = dumb_task_runner(self.add_pending_conns, 0.1)
+
+  def __del__(self):
+    self._s.close()
+
+  def output(self, msg):
+    try:
+      sbs1_msg = self.parse(msg)
+      if sbs1_msg is not None:
+        sbs1_bytes = sbs1_msg.encode('utf-8')
+        for conn in self._conns[:]: #iterate over a copy of the list
+          conn.send(sbs1_bytes)
+    except socket.error:
+      self._conns.remove(conn)
+      print("Connections: ", len(self._conns))
+    except ADSBError:
+      pass
+
+  def add_pending_conns(self):
+    try:
+      conn, addr = self._s.accept()
+      self._conns.append(conn)
+      print("Connections: ", len(self._conns))
+    except socket.error:
+      pass
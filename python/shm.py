@@ -0,0 +1,135 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#shared-memory ring buffer of decoded frames, for consumers on the same box.
+#one writer (output_shm, fed from the parser's pubsub) appends fixed-size
+#records to a memory-mapped file, ideally on /dev/shm; any number of
+#readers (shm_reader) tail it by watching the write count in the header.
+#nothing is copied or signalled per frame: the writer stores the record,
+#then its sequence number, then the header count, and a reader checks the
+#sequence number after it has unpacked a record to make sure the writer
+#didn't lap it while it was looking.
+#
+#header (64 bytes): magic, version, record size, capacity, write count
+#record (48 bytes): sequence number + 1, integer seconds, fractional
+#seconds, rssi (dB), syndrome, frame length in bytes, frame (14 bytes)
+
+import mmap
+import os
+import struct
+import time
+import air_modes
+
+SHM_MAGIC = b"MODESRNG"
+SHM_VERSION = 1
+_header = struct.Struct("<8sIII")
+_count = struct.Struct("<Q")
+_COUNT_OFFSET = 24
+_HEADER_SIZE = 64
+_record = struct.Struct("<QQdfIB14sx")
+_seq = struct.Struct("<Q")
+
+class output_shm:
+  def __init__(self, path, publisher, capacity=65536):
+    self._capacity = capacity
+    self._count = 0
+    size = _HEADER_SIZE + capacity * _record.size
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+      os.ftruncate(fd, size)
+      self._map = mmap.mmap(fd, size)
+    finally:
+      os.close(fd)
+    #a count of zero tells readers of a previous run to start over
+    _count.pack_into(self._map, _COUNT_OFFSET, 0)
+    _header.pack_into(self._map, 0, SHM_MAGIC, SHM_VERSION, _record.size, capacity)
+    publisher.subscribe("modes_dl", self.output)
+
+  def output(self, msg):
+    nbytes = msg.data.get_numbits() // 8
+    offset = _HEADER_SIZE + (self._count % self._capacity) * _record.size
+    _record.pack_into(self._map, offset, 0, msg.timestamp.secs, msg.timestamp.frac_secs,
+                      msg.rssi, msg.ecc, nbytes, msg.data.data.to_bytes(nbytes, "big"))
+    self._count += 1
+    #publish the record, then the count, so readers never see a half-written one
+    _seq.pack_into(self._map, offset, self._count)
+    _count.pack_into(self._map, _COUNT_OFFSET, self._count)
+
+  def close(self):
+    self._map.close()
+
+class shm_reader:
+  def __init__(self, path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+      self._map = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+    finally:
+      os.close(fd)
+    magic, version, recsize, self._capacity = _header.unpack_from(self._map, 0)
+    if magic != SHM_MAGIC or version != SHM_VERSION or recsize != _record.size:
+      raise ValueError("%s is not a version %i frame ring" % (path, SHM_VERSION))
+    #start at the live end of the ring rather than replaying what's there
+    self._next = self.count()
+    self.dropped = 0
+
+  def count(self):
+    return _count.unpack_from(self._map, _COUNT_OFFSET)[0]
+
+  def records(self):
+    """Yield (secs, frac_secs, rssi, syndrome, frame bytes) for each record
+    written since the last call, unpacked straight out of the mapping."""
+    count = self.count()
+    if count < self._next: #writer restarted
+      self._next = 0
+    if count - self._next > self._capacity: #we were lapped
+      self.dropped += count - self._next - self._capacity
+      self._next = count - self._capacity
+    while self._next < count:
+      offset = _HEADER_SIZE + (self._next % self._capacity) * _record.size
+      seq, secs, frac, rssi, ecc, nbytes, data = _record.unpack_from(self._map, offset)
+      #if the writer got here first, the record isn't the one we wanted
+      if seq != self._next + 1 or _seq.unpack_from(self._map, offset)[0] != seq:
+        self.dropped += 1
+      else:
+        yield secs, frac, rssi, ecc, data[:nbytes]
+      self._next += 1
+
+  def reports(self):
+    """As records(), but as modes_reports like the ones on the pubsub."""
+    for secs, frac, rssi, ecc, data in self.records():
+      try:
+        yield air_modes.modes_report(air_modes.modes_reply(int.from_bytes(data, "big")),
+                                     ecc, rssi, air_modes.stamp(secs, frac))
+      except air_modes.ADSBError:
+        pass
+
+  def tail(self, interval=0.01):
+    """Yield modes_reports forever, checking for new ones every interval seconds."""
+    while True:
+      got = False
+      for report in self.reports():
+        got = True
+        yield report
+      if not got:
+        time.sleep(interval)
+
+  def close(self):
+    self._map.close()
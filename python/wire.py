@@ -0,0 +1,126 @@
+#
+# Copyright 2026 Nick Foster
+#
+# This file is part of gr-air-modes
+#
+# gr-air-modes is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-air-modes is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-air-modes; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+#binary record format for downlink frames.
+#the slicer's ASCII line spends about 60 bytes on a 14-byte frame; this is
+#a fixed 32-byte little-endian header followed by the frame itself:
+#
+#  magic      u8   0xA5, which can't start an ASCII line
+#  version    u8   WIRE_VERSION
+#  length     u8   frame length in bytes, 7 or 14
+#  flags      u8   reserved, 0
+#  syndrome   u32  CRC syndrome (24 bits)
+#  rssi       f32  signal level in dB
+#  secs       u64  integer part of the timestamp
+#  frac       f64  fractional part of the timestamp
+#  station    u32  id of the receiving station
+#  frame      length bytes
+#
+#a decoder must reject versions it doesn't know. later versions may only
+#append to the header, so length always follows the magic and version.
+
+import math
+import struct
+
+WIRE_MAGIC = 0xA5
+WIRE_VERSION = 1
+_header = struct.Struct("<BBBBIfQdI")
+WIRE_HEADER_SIZE = _header.size
+
+#wire records are published under dl.NN, NN being the downlink format, so
+#a subscriber can let ZMQ's prefix matching throw away the DFs it doesn't
+#want before Python sees them; subscribing to "dl." gets them all. ASCII
+#lines, and anything from feeders older than the per-DF topics, come under
+#plain dl_data, which doesn't share the prefix. parse.subscribe_dl() takes
+#care of both. DL_TOPICS is indexed by the first byte of the frame >> 3;
+#DF24 only uses two bits.
+DL_PREFIX = "dl."
+DL_LEGACY = "dl_data"
+DL_TOPICS = tuple("%s%02i" % (DL_PREFIX, min(df, 24)) for df in range(32))
+
+def is_wire(buf):
+    return len(buf) > 0 and buf[0] == WIRE_MAGIC
+
+def encode(frame, syndrome, rssi, secs, frac, station=0):
+    return _header.pack(WIRE_MAGIC, WIRE_VERSION, len(frame), 0,
+                        syndrome, rssi, secs, frac, station) + bytes(frame)
+
+def decode(buf):
+    """Returns (frame bytes, syndrome, rssi, secs, frac, station)."""
+    if len(buf) < WIRE_HEADER_SIZE or buf[0] != WIRE_MAGIC:
+        raise ValueError("not a wire record")
+    magic, version, length, flags, syndrome, rssi, secs, frac, station = _header.unpack_from(buf, 0)
+    if version != WIRE_VERSION:
+        raise ValueError("unsupported wire record version %i" % version)
+    if len(buf) != WIRE_HEADER_SIZE + length:
+        raise ValueError("wire record is %i bytes, expected %i" % (len(buf), WIRE_HEADER_SIZE + length))
+    return bytes(buf[WIRE_HEADER_SIZE:]), syndrome, rssi, secs, frac, station
+
+#CRC syndrome of a whole frame, as the slicer computes it: zero for a good
+#DF11/17/18, the transponder address for most of the rest. frames from
+#other receivers arrive without one.
+def _crc_table():
+    table = []
+    for n in range(256):
+        crc = n << 16
+        for k in range(8):
+            crc = ((crc << 1) ^ 0xFFF409 if crc & 0x800000 else crc << 1) & 0xFFFFFF
+        table.append(crc)
+    return table
+_crc = _crc_table()
+
+def syndrome(frame):
+    crc = 0
+    for byte in frame[:-3]:
+        crc = _crc[(crc >> 16) ^ byte] ^ ((crc << 8) & 0xFFFFFF)
+    return crc ^ int.from_bytes(frame[-3:], "big")
+
+#the slicer's reference level in dB
+def rssi(reference):
+    return 10.0*math.log10(max(1e-8, reference))
+
+#convert one of the slicer's ASCII lines to a wire record
+def from_ascii(line, station=0):
+    [data, ecc, reference, int_timestamp, frac_timestamp] = line.split()
+    return encode(bytes.fromhex(data.decode() if isinstance(data, bytes) else data),
+                  int(ecc, 16), rssi(float(reference)),
+                  int(int_timestamp), float(frac_timestamp), station)
+
+#downlink format of a message in either format. raises ValueError if it
+#isn't one.
+def df(message):
+    try:
+        if is_wire(message):
+            return min(message[WIRE_HEADER_SIZE] >> 3, 24)
+        return min(int(message[:2], 16) >> 3, 24)
+    except IndexError:
+        raise ValueError("message too short")
+
+#topic for a wire record
+def topic(record):
+    return DL_TOPICS[record[WIRE_HEADER_SIZE] >> 3]
+
+#decode a message in either format. ASCII lines carry no station
+#id, so they come back as station 0.
+def decode_message(message):
+    if is_wire(message):
+        return decode(message)
+    return decode(from_ascii(message))
@@ -25,17 +25,158 @@
 
 import time
 import threading
+import socket
+import struct
+import zlib
 import zmq
 from gnuradio.gr.pubsub import pubsub
 import queue
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-class zmq_pubsub_iface(threading.Thread):
-    def __init__(self, context, subaddr=None, pubaddr=None):
+#outgoing messages can be batched: up to batch_size values published under
+#the same key go out as one multipart message [key, val1, val2, ...], held
+#back no longer than batch_latency seconds. with the default batch_size of
+#1 every message goes out alone as [key, val], which is just a batch of one,
+#so batched and unbatched ends interoperate. subscribers get one callback
+#per value unless they subscribe with batched=True, in which case they get
+#one callback with the list of values in each batch.
+#
+#the send queue holds at most queue_limit values (0 for no limit). when it's
+#full, drop_policy says what gives: "drop-oldest" discards the value at the
+#head of the queue, "drop-newest" discards the one being published, and
+#"block" makes the publisher wait. sndhwm and rcvhwm set the ZMQ high-water
+#marks. get_stats() returns the counters, which are also printed every
+#stats_interval seconds if that's nonzero.
+#
+#with compression set to "zlib" or "zstd" (at compression_level), each batch
+#goes out as [key, marker, blob] instead: marker names the codec, and blob
+#is the compressed values, each preceded by its length as a little-endian
+#u32. subscribers recognize the marker and unpack the batch whatever their
+#own settings, as long as they have the codec (zstd needs the zstandard
+#module). no value may be equal to a marker.
+#
+#subscriptions are prefixes, as in ZMQ: a subscriber to "dl." also
+#gets values published under "dl.17". which subscribed keys an
+#address reaches is worked out the first time it's seen.
+DROP_POLICIES = ("drop-oldest", "drop-newest", "block")
+COMPRESSION_MARKERS = {"zlib": b"\0zlib", "zstd": b"\0zstd"}
+_length = struct.Struct("<I")
+_codec_errors = (zlib.error, struct.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+def is_compressed(msgs):
+    return len(msgs) == 2 and msgs[0] in COMPRESSION_MARKERS.values()
+
+#the message parts that follow the key for a batch of values: the values
+#themselves, or with compression set, [marker, blob]. also returns the
+#size of the uncompressed blob, 0 if there isn't one.
+def pack_batch(batch, compression=None, level=6, zstd_compressor=None):
+    if compression is None:
+        return batch, 0
+    raw = b"".join(_length.pack(len(val)) + val for val in batch)
+    if compression == "zstd":
+        blob = zstd_compressor.compress(raw)
+    else:
+        blob = zlib.compress(raw, level)
+    return [COMPRESSION_MARKERS[compression], blob], len(raw)
+
+#returns the raw concatenated batch and the values in it. raises ValueError
+#if the batch is corrupt or we don't have its codec.
+def unpack_compressed(marker, blob):
+    try:
+        if marker == COMPRESSION_MARKERS["zstd"]:
+            if zstandard is None:
+                raise ValueError("zstd compressed batch, but no zstandard module")
+            raw = zstandard.ZstdDecompressor().decompress(blob)
+        else:
+            raw = zlib.decompress(blob)
+        vals = []
+        offset = 0
+        while offset < len(raw):
+            [length] = _length.unpack_from(raw, offset)
+            offset += _length.size
+            vals.append(raw[offset:offset+length])
+            offset += length
+    except _codec_errors as e:
+        raise ValueError("corrupt compressed batch: %s" % e)
+    return raw, vals
+
+#prefix-matching dispatch to subscribers, shared with aio_relay. expects
+#_pubsub, _batch_pubsub, _keys, _batched_keys and _routes. subscribe()
+#runs on other threads than _dispatch(), so the key sets are frozensets
+#replaced whole rather than changed, and the route cache is replaced along
+#with them; _dispatch() only ever reads one snapshot of each.
+class prefix_dispatch:
+    def _subscribed(self, key, batched):
+        if batched:
+            self._batched_keys = self._batched_keys | {key}
+        else:
+            self._keys = self._keys | {key}
+        self._routes = {}
+
+    def _dispatch(self, address, msgs):
+        routes_cache = self._routes
+        routes = routes_cache.get(address)
+        if routes is None:
+            keys, batched_keys = self._keys, self._batched_keys
+            routes = ([key for key in keys if address.startswith(key)],
+                      [key for key in batched_keys if address.startswith(key)])
+            routes_cache[address] = routes
+        for key in routes[1]:
+            self._batch_pubsub[key] = msgs
+        for key in routes[0]:
+            for msg in msgs:
+                self._pubsub[key] = msg
+
+class zmq_pubsub_iface(prefix_dispatch, threading.Thread):
+    def __init__(self, context, subaddr=None, pubaddr=None, batch_size=1, batch_latency=0,
+                 queue_limit=0, drop_policy="drop-oldest", sndhwm=None, rcvhwm=None,
+                 stats_interval=0, name="zmq_pubsub_iface", compression=None, compression_level=6):
         threading.Thread.__init__(self)
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("drop_policy must be one of %s" % ", ".join(DROP_POLICIES))
+        if compression is not None and compression not in COMPRESSION_MARKERS:
+            raise ValueError("compression must be one of %s" % ", ".join(COMPRESSION_MARKERS))
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard module")
+        self._compression = compression
+        self._compression_level = compression_level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=compression_level) if compression == "zstd" else None
+        self._raw_bytes = 0
+        self._compressed_bytes = 0
+        self._compress_time = 0.0
+        self._decompress_time = 0.0
+        self._undecodable = 0
         #private data
-        self._queue = queue.Queue()
+        self._queue = queue.Queue(queue_limit)
+        #connects and (un)subscriptions waiting for the run loop, which is
+        #the only thread that touches the sub socket once it's started.
+        #(option, key), or (None, None) to connect.
+        self._sockops = queue.Queue()
+        self._drop_policy = drop_policy
+        self._name = name
+        self._stats_interval = stats_interval
+        self._next_stats = time.time() + stats_interval
+        self._enqueued = 0
+        self._sent = 0
+        self._dropped = 0
+        self._received = 0
+        self._batch_size = max(1, batch_size)
+        self._batch_latency = batch_latency
+        self._pending = {}
+        self._pending_since = None
+        self._batch_pubsub = pubsub()
+        self._batched_keys = frozenset()
+        self._keys = frozenset()
+        self._routes = {}
         self._subsocket = context.socket(zmq.SUB)
         self._pubsocket = context.socket(zmq.PUB)
+        if sndhwm is not None:
+            self._pubsocket.setsockopt(zmq.SNDHWM, sndhwm)
+        if rcvhwm is not None:
+            self._subsocket.setsockopt(zmq.RCVHWM, rcvhwm)
         self._subaddr = subaddr
         self._pubaddr = pubaddr
         if type(self._subaddr) is str:
@@ -48,8 +189,18 @@ class zmq_pubsub_iface(threading.Thread):
             for addr in self._pubaddr:
                 self._pubsocket.bind(addr.encode('ascii'))
 
+        #the run loop sleeps in poll() until there's something to receive
+        #or __setitem__ or subscribe() writes to the wakeup socket to say
+        #there's something to send or a socket option to set. only the
+        #first message after the loop has caught up needs to signal it.
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._signalled = False
+
         self._poller = zmq.Poller()
         self._poller.register(self._subsocket, zmq.POLLIN)
+        self._poller.register(self._wakeup_r, zmq.POLLIN)
 
         #public data
         self.shutdown = threading.Event()
@@ -58,19 +209,40 @@ class zmq_pubsub_iface(threading.Thread):
         self.setDaemon(True)
         self.start()
 
-    def subscribe(self, key, subscriber):
+    def subscribe(self, key, subscriber, batched=False):
         if not self._sub_connected:
             if not self._subaddr:
                 raise Exception("No subscriber address set")
-            for addr in self._subaddr:
-                self._subsocket.connect(addr.encode('ascii'))
+            self._sockops.put((None, None))
             self._sub_connected = True
-        self._subsocket.setsockopt(zmq.SUBSCRIBE, key.encode('ascii'))
-        self._pubsub.subscribe(key.encode('ascii'), subscriber)
+        if batched:
+            self._batch_pubsub.subscribe(key.encode('ascii'), subscriber)
+        else:
+            self._pubsub.subscribe(key.encode('ascii'), subscriber)
+        self._subscribed(key.encode('ascii'), batched)
+        self._sockops.put((zmq.SUBSCRIBE, key.encode('ascii')))
+        self._wakeup()
 
-    def unsubscribe(self, key, subscriber):
-        self._subsocket.setsockopt(zmq.UNSUBSCRIBE, key.encode('ascii'))
-        self._pubsub.unsubscribe(key.encode('ascii'), subscriber)
+    def unsubscribe(self, key, subscriber, batched=False):
+        self._sockops.put((zmq.UNSUBSCRIBE, key.encode('ascii')))
+        self._wakeup()
+        if batched:
+            self._batch_pubsub.unsubscribe(key.encode('ascii'), subscriber)
+        else:
+            self._pubsub.unsubscribe(key.encode('ascii'), subscriber)
+
+    #run loop only
+    def _apply_sockops(self):
+        while True:
+            try:
+                [option, key] = self._sockops.get(block=False)
+            except queue.Empty:
+                return
+            if option is None:
+                for addr in self._subaddr:
+                    self._subsocket.connect(addr.encode('ascii'))
+            else:
+                self._subsocket.setsockopt(option, key)
 
     #executed from the thread context(s) of the caller(s)
     #so we use a queue to push sending into the run loop
@@ -79,40 +251,179 @@ class zmq_pubsub_iface(threading.Thread):
         if not self._pubaddr:
             raise Exception("No publisher address set")
         if not self.shutdown.is_set():
-            self._queue.put([key.encode('ascii'), val])
+            msg = [key.encode('ascii'), val]
+            if self._drop_policy == "block":
+                while True:
+                    try:
+                        self._queue.put(msg, timeout=0.1)
+                        break
+                    except queue.Full:
+                        if self.shutdown.is_set():
+                            return
+            else:
+                try:
+                    self._queue.put_nowait(msg)
+                except queue.Full:
+                    self._dropped += 1
+                    if self._drop_policy == "drop-newest":
+                        return
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    try:
+                        self._queue.put_nowait(msg)
+                    except queue.Full:
+                        #another producer took the slot we freed
+                        self._dropped += 1
+                        return
+            self._enqueued += 1
+            self._wakeup()
+
+    def _wakeup(self):
+        if not self._signalled:
+            self._signalled = True
+            try:
+                self._wakeup_w.send(b"\0")
+            except BlockingIOError:
+                pass #the loop has plenty of wakeups to read already
 
     def __getitem__(self, key):
         return self._pubsub[key.encode('ascii')]
 
+    #compression_ratio is uncompressed over compressed bytes, for whichever
+    #direction this end compresses or decompresses. the times are CPU
+    #seconds this thread spent in the codec.
+    def get_stats(self):
+        return {"enqueued": self._enqueued,
+                "sent": self._sent,
+                "dropped": self._dropped,
+                "received": self._received,
+                "depth": self._queue.qsize(),
+                "raw_bytes": self._raw_bytes,
+                "compressed_bytes": self._compressed_bytes,
+                "compression_ratio": float(self._raw_bytes) / self._compressed_bytes if self._compressed_bytes else 1.0,
+                "compress_time": self._compress_time,
+                "decompress_time": self._decompress_time,
+                "undecodable": self._undecodable}
+
+    def _print_stats(self):
+        stats = self.get_stats()
+        print("%s: enqueued %i sent %i dropped %i received %i depth %i" % (self._name,
+              stats["enqueued"], stats["sent"], stats["dropped"], stats["received"], stats["depth"]))
+        if self._compressed_bytes:
+            print("%s: compression ratio %.2f, %.3fs compressing, %.3fs decompressing" % (self._name,
+                  stats["compression_ratio"], stats["compress_time"], stats["decompress_time"]))
+
+    def _send(self, key, batch):
+        if self._compression is None:
+            self._pubsocket.send_multipart([key] + batch)
+            return
+        start = time.thread_time()
+        parts, raw_len = pack_batch(batch, self._compression, self._compression_level, self._zstd_compressor)
+        self._compress_time += time.thread_time() - start
+        self._raw_bytes += raw_len
+        self._compressed_bytes += len(parts[1])
+        self._pubsocket.send_multipart([key] + parts)
+
+    #unpack a compressed batch, or return None if we can't
+    def _decompress(self, marker, blob):
+        start = time.thread_time()
+        try:
+            raw, vals = unpack_compressed(marker, blob)
+        except ValueError:
+            return None
+        finally:
+            self._decompress_time += time.thread_time() - start
+        self._raw_bytes += len(raw)
+        self._compressed_bytes += len(blob)
+        return vals
+
+    #queue a value for sending, and send its batch if that fills it
+    def _enqueue(self, key, val):
+        self._sent += 1
+        if self._batch_size == 1:
+            self._send(key, [val])
+            return
+        batch = self._pending.setdefault(key, [])
+        batch.append(val)
+        if self._pending_since is None:
+            self._pending_since = time.time()
+        if len(batch) >= self._batch_size:
+            self._send(key, batch)
+            del self._pending[key]
+            if not self._pending:
+                self._pending_since = None
+
+    def _flush(self):
+        for key, batch in self._pending.items():
+            self._send(key, batch)
+        self._pending = {}
+        self._pending_since = None
+
     def run(self):
-        done = False
-        while not self.shutdown.is_set() and not done:
-            if self.shutdown.is_set():
-                done = True
-            #send
+        while not self.shutdown.is_set():
+            #sleep no longer than the oldest pending batch may wait,
+            #or until it's time to print the counters
+            deadlines = []
+            if self._pending_since is not None:
+                deadlines.append(self._pending_since + self._batch_latency)
+            if self._stats_interval > 0:
+                deadlines.append(self._next_stats)
+            timeout = None
+            if deadlines:
+                timeout = max(0, 1000 * (min(deadlines) - time.time()))
+            events = dict(self._poller.poll(timeout))
+            if self._stats_interval > 0 and time.time() >= self._next_stats:
+                self._print_stats()
+                self._next_stats = time.time() + self._stats_interval
+            #send. clear the flag before draining so anything queued from
+            #here on signals us again.
+            if self._wakeup_r in events:
+                try:
+                    while self._wakeup_r.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                self._signalled = False
+            self._apply_sockops()
             while True:
                 try:
-                    msg = self._queue.get(block=False)
-                    self._pubsocket.send_multipart(msg)
+                    [key, val] = self._queue.get(block=False)
                 except queue.Empty:
                     break
+                self._enqueue(key, val)
+            if self._pending_since is not None \
+               and time.time() >= self._pending_since + self._batch_latency:
+                self._flush()
             #receive
-            if self._sub_connected:
-                socks = [s[0].underlying for s in self._poller.poll(timeout=0) if s[1] == zmq.POLLIN]
-                while self._subsocket.underlying in socks:
-                    [address, msg] = self._subsocket.recv_multipart()
-                    self._pubsub[address] = msg
-                    socks = [s[0].underlying for s in self._poller.poll(timeout=0) if s[1] == zmq.POLLIN]
-            #snooze
-            if not done:
-                time.sleep(0.1)
+            if self._subsocket in events:
+                while True:
+                    try:
+                        msgs = self._subsocket.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    address = msgs.pop(0)
+                    if is_compressed(msgs):
+                        msgs = self._decompress(msgs[0], msgs[1])
+                        if msgs is None:
+                            self._undecodable += 1
+                            continue
+                    self._received += len(msgs)
+                    self._dispatch(address, msgs)
 
+        if self._pending:
+            self._flush()
         self._subsocket.close()
         self._pubsocket.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
         self.finished.set()
 
     def close(self):
         self.shutdown.set()
+        self._signalled = False
+        self._wakeup()
         #self._queue.join() #why does this block forever
         self.finished.wait(0.2)
 
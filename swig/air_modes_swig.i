@@ -7,11 +7,19 @@
 %{
 #include "gr_air_modes/preamble.h"
 #include "gr_air_modes/slicer.h"
+#include "gr_air_modes/demod.h"
+#include "gr_air_modes/replay_source.h"
+#include "gr_air_modes/crc.h"
 %}
 
 %include "gr_air_modes/preamble.h"
 %include "gr_air_modes/slicer.h"
+%include "gr_air_modes/demod.h"
+%include "gr_air_modes/replay_source.h"
+%include "gr_air_modes/crc.h"
 
 GR_SWIG_BLOCK_MAGIC2(air_modes,preamble);
 GR_SWIG_BLOCK_MAGIC2(air_modes,slicer);
+GR_SWIG_BLOCK_MAGIC2(air_modes,demod);
+GR_SWIG_BLOCK_MAGIC2(air_modes,replay_source);
 